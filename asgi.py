@@ -0,0 +1,5 @@
+from back_end.asgi import create_asgi_app
+from main import app as flask_app
+
+# gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+app = create_asgi_app(flask_app)
@@ -2,9 +2,10 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from os import path
 from flask_login import LoginManager
-from flask_cors import CORS
+import logging
 db = SQLAlchemy()
 DB_NAME = "database.db"
+logger = logging.getLogger(__name__)
 
 def create_app():
     app = Flask(__name__)
@@ -23,6 +24,20 @@ def create_app():
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     # app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
     
+    # Connection pool. DB_POOL_TIMEOUT is how many whole seconds a request
+    # may wait for a connection before it is answered with a 503;
+    # DB_STATEMENT_TIMEOUT_MS caps every statement on the server side (0
+    # disables it).
+    app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 5))
+    app.config["DB_MAX_OVERFLOW"] = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+    app.config["DB_POOL_TIMEOUT"] = int(os.environ.get("DB_POOL_TIMEOUT", 3))
+    app.config["DB_POOL_RECYCLE"] = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    app.config["DB_POOL_PRE_PING"] = os.environ.get("DB_POOL_PRE_PING", "true") == "true"
+    app.config["DB_STATEMENT_TIMEOUT_MS"] = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 15000))
+    
+    from .pool import engine_options
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app)
+    
     is_production = (
         'RENDER' in os.environ or 
         os.environ.get('FLASK_ENV') == 'production' or 
@@ -43,7 +58,89 @@ def create_app():
     app.config["SESSION_COOKIE_DOMAIN"] = None
     app.config["PERMANENT_SESSION_LIFETIME"] = 86400
 
+    # "cookie" keeps Flask's signed cookie sessions; "redis" and "memory"
+    # store the session server side behind an opaque session id.
+    app.config["SESSION_BACKEND"] = os.environ.get("SESSION_BACKEND", "cookie")
+    app.config["REDIS_URL"] = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    app.config["SESSION_KEY_PREFIX"] = os.environ.get("SESSION_KEY_PREFIX", "session:")
+    app.config["SESSION_REFRESH_INTERVAL"] = int(os.environ.get("SESSION_REFRESH_INTERVAL", 3600))
+
+    # How long browsers may reuse a CORS preflight (Access-Control-Max-Age,
+    # seconds; 0 leaves the header out). Chromium caps it at 7200.
+    app.config["CORS_MAX_AGE"] = int(os.environ.get("CORS_MAX_AGE", 86400))
+
+    # Optional write-behind buffering for /save-points. POINTS_DURABILITY is
+    # "flushed" (wait for the batch commit) or "buffered" (ack on enqueue).
+    app.config["POINTS_WRITE_BEHIND"] = os.environ.get("POINTS_WRITE_BEHIND") == "true"
+    app.config["POINTS_FLUSH_INTERVAL_MS"] = int(os.environ.get("POINTS_FLUSH_INTERVAL_MS", 200))
+    app.config["POINTS_FLUSH_BATCH_SIZE"] = int(os.environ.get("POINTS_FLUSH_BATCH_SIZE", 500))
+    app.config["POINTS_QUEUE_SIZE"] = int(os.environ.get("POINTS_QUEUE_SIZE", 10000))
+    app.config["POINTS_DURABILITY"] = os.environ.get("POINTS_DURABILITY", "flushed")
+    app.config["POINTS_ENQUEUE_TIMEOUT_MS"] = int(os.environ.get("POINTS_ENQUEUE_TIMEOUT_MS", 50))
+
+    app.config["POINT_RETENTION_DAYS"] = int(os.environ.get("POINT_RETENTION_DAYS", 30))
+    app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", 1024))
+    app.config["USER_CACHE_TTL"] = int(os.environ.get("USER_CACHE_TTL", 60))
+    # How long a process reuses a resource version (ETag) lookup before
+    # asking the database again.
+    app.config["RESOURCE_VERSION_TTL"] = float(os.environ.get("RESOURCE_VERSION_TTL", 1.0))
+    # Read-through cache for public read endpoints: "local" (per-process
+    # LRU), "redis" (shared via REDIS_URL) or "none".
+    app.config["RESPONSE_CACHE"] = os.environ.get("RESPONSE_CACHE", "local")
+    app.config["RESPONSE_CACHE_SIZE"] = int(os.environ.get("RESPONSE_CACHE_SIZE", 512))
+    app.config["RESPONSE_CACHE_TTL"] = int(os.environ.get("RESPONSE_CACHE_TTL", 60))
+    app.config["RESPONSE_CACHE_PREFIX"] = os.environ.get("RESPONSE_CACHE_PREFIX", "response:")
+    # Structured JSON logs. LOG_HANDLER=queue hands records to a background
+    # thread; LOG_ENDPOINT_LEVELS ("views.save_points=WARNING,...") and
+    # LOG_SAMPLE_RATES ("points.saved=0.01,...") tune the hot paths.
+    app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL", "INFO")
+    app.config["LOG_HANDLER"] = os.environ.get("LOG_HANDLER", "queue")
+    app.config["LOG_QUEUE_SIZE"] = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    app.config["LOG_ENDPOINT_LEVELS"] = os.environ.get("LOG_ENDPOINT_LEVELS", "")
+    app.config["LOG_SAMPLE_RATES"] = os.environ.get("LOG_SAMPLE_RATES", "")
+    # METRICS_DIR is a directory shared by all gunicorn workers so that
+    # /metrics aggregates every worker's counters; gunicorn.conf.py sets one
+    # up by default. Unset, /metrics reports this process only.
+    app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR")
+    app.config["METRICS_FLUSH_INTERVAL"] = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))
+    # Per-request query accounting. X-DB-Queries/X-DB-Time-ms headers are sent
+    # in debug mode or with SQL_QUERY_HEADERS=true; SQL_STRICT_REPEAT_LIMIT > 0
+    # fails any request that runs one statement more often than that.
+    app.config["SQL_QUERY_HEADERS"] = os.environ.get("SQL_QUERY_HEADERS") == "true"
+    app.config["SQL_STRICT_REPEAT_LIMIT"] = int(os.environ.get("SQL_STRICT_REPEAT_LIMIT", 0))
+    # asgi.py only: threads that serve the routes still handled by Flask.
+    app.config["ASYNC_WSGI_THREADS"] = int(os.environ.get("ASYNC_WSGI_THREADS", 10))
+    # Request threads per process, read from the same variable as
+    # gunicorn.conf.py. Unless PASSWORD_HASH_MAX_PENDING is set, hashing may
+    # occupy all but one of them; further logins get a 503.
+    app.config["REQUEST_THREADS"] = int(os.environ.get("GUNICORN_THREADS", 4))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    max_pending = os.environ.get("PASSWORD_HASH_MAX_PENDING")
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(max_pending) if max_pending else None
+    # Stored hashes that don't match this policy are rehashed on next login.
+    app.config["PASSWORD_HASH_ALGORITHM"] = os.environ.get("PASSWORD_HASH_ALGORITHM", "pbkdf2")
+    app.config["PASSWORD_PBKDF2_HASH"] = os.environ.get("PASSWORD_PBKDF2_HASH", "sha256")
+    app.config["PASSWORD_PBKDF2_ITERATIONS"] = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", 600000))
+    app.config["PASSWORD_SCRYPT_N"] = int(os.environ.get("PASSWORD_SCRYPT_N", 32768))
+    app.config["PASSWORD_SCRYPT_R"] = int(os.environ.get("PASSWORD_SCRYPT_R", 8))
+    app.config["PASSWORD_SCRYPT_P"] = int(os.environ.get("PASSWORD_SCRYPT_P", 1))
+
+    from .logs import init_logging
+    init_logging(app)
+
     db.init_app(app)
+
+    from .sessions import init_session_backend
+    init_session_backend(app)
+
+    from .ingest import init_points_buffer
+    init_points_buffer(app)
+
+    from .hashing import init_password_hasher
+    init_password_hasher(app)
+
+    from .responsecache import init_response_cache
+    init_response_cache(app)
     from .view import view
     from .auth import auth
     from .leaderboards import leaderboard
@@ -52,17 +149,33 @@ def create_app():
     app.register_blueprint(auth, url_prefix="/")
     app.register_blueprint(leaderboard, url_prefix="/")
 
-    from .models import User, Note, Point, UserCompletion, GameScore
+    from .models import User, Note, Point, UserCompletion, GameScore, UserStats, PointRollup, ResourceVersion, FeedbackStats
+    from .stats import backfill_feedback_stats_command, backfill_user_stats_command
+    from .compaction import compact_points_command
+    from .hashing import calibrate_password_hash_command
 
     create_database(app)
+    app.cli.add_command(backfill_user_stats_command)
+    app.cli.add_command(backfill_feedback_stats_command)
+    app.cli.add_command(compact_points_command)
+    app.cli.add_command(calibrate_password_hash_command)
 
     login_manager = LoginManager()
     login_manager.login_view = "auth.login"
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(id):
-        return User.query.get(int(id))
+    from .identity import init_user_cache
+    init_user_cache(app, login_manager)
+
+    from .metrics import init_metrics, metrics
+    init_metrics(app)
+    app.register_blueprint(metrics, url_prefix="/")
+
+    from .sqlstats import init_query_stats
+    init_query_stats(app)
+
+    from .pool import init_pool_telemetry
+    init_pool_telemetry(app)
 
     @login_manager.unauthorized_handler
     def unauthorized():
@@ -75,29 +188,15 @@ def create_app():
     return app
 
 def create_database(app):
+    from .migrations import run_migrations
+    
     with app.app_context():
         try:
-            db.create_all()
-            
-            from sqlalchemy import text
-            try:
-                with db.engine.begin() as conn:
-                    result = conn.execute(text("""
-                        SELECT character_maximum_length 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'user' AND column_name = 'password'
-                    """))
-                    row = result.fetchone()
-                    if row and row[0] and row[0] < 200:
-                        conn.execute(text("ALTER TABLE \"user\" ALTER COLUMN password TYPE VARCHAR(200)"))
-                        print("Updated password column to VARCHAR(200)")
-            except Exception as alter_error:
-                print(f"Note: Could not alter password column (may not exist yet or already updated): {alter_error}")
-            
-            print(f"PostgreSQL database tables created/verified successfully!")
-            print(f"Database URI: {app.config['SQLALCHEMY_DATABASE_URI'].split('@')[1] if '@' in app.config['SQLALCHEMY_DATABASE_URI'] else 'configured'}")
-        except Exception as e:
-            print(f"Error creating database tables: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise
\ No newline at end of file
+            version = run_migrations(db.engine)
+            logger.info("Database schema is current", extra={"fields": {
+                "schemaVersion": version,
+                "database": app.config['SQLALCHEMY_DATABASE_URI'].split('@')[1] if '@' in app.config['SQLALCHEMY_DATABASE_URI'] else 'configured'
+            }})
+        except Exception:
+            logger.exception("Error migrating database schema")
+            raise
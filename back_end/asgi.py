@@ -0,0 +1,537 @@
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import time
+from a2wsgi import WSGIMiddleware
+from flask_login.config import COOKIE_NAME
+from flask_login.utils import decode_cookie
+from sqlalchemy import exc, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.middleware import Middleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.exceptions import BadRequest
+from werkzeug.formparser import parse_form_data
+from werkzeug.http import parse_date, parse_etags, parse_options_header
+from .hashing import default_max_pending
+from .identity import CachedUser
+from .ingest import BufferFull
+from .leaderboards import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, _apply_ranks, _decode_cursor, _page_select,
+    _rank_counts_select, _split_page, game_board_versions
+)
+from .logs import log_event
+from .models import Point, User
+from .pool import POOL_TIMEOUT_PAYLOAD, async_database_url, async_engine_options
+from .responsecache import cache_key, decode_entry, encode_entry
+from .scores import merge_game_score_statement
+from .stats import record_points_statement, touch_user_stats_statement
+from .versions import (
+    LEADERBOARD, add_validators, bump_version_statement, bump_versions_statement,
+    cached_version, forget_versions, is_not_modified, remember_version, version_statement
+)
+from .view import _game_score_result, _parse_game_score, _parse_points, _points_pending_result
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFrontend:
+    # Serves the hot I/O-bound routes on the event loop with SQLAlchemy's
+    # async engine; everything else is handed to the Flask app unchanged.
+    # Handlers mirror the Flask views: same statements, same response bodies
+    # and headers, same session cookie.
+    def __init__(self, app):
+        self.app = app
+        self._engine = None
+        self._flights = {}
+
+    @property
+    def engine(self):
+        # Created on first use, so that with gunicorn --preload every worker
+        # opens its own connections after the fork.
+        if self._engine is None:
+            self._engine = create_async_engine(
+                async_database_url(self.app.config["SQLALCHEMY_DATABASE_URI"]),
+                **async_engine_options(self.app)
+            )
+        return self._engine
+
+    async def dispose(self):
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+    def route(self, path, handler, method):
+        async def endpoint(request):
+            return await self._serve(path, handler, request)
+        return Route(path, endpoint, methods=[method])
+
+    async def _serve(self, path, handler, request):
+        metrics = self.app.extensions.get("metrics")
+        started = time.perf_counter()
+        if metrics is not None:
+            metrics.request_started()
+        try:
+            try:
+                response = await handler(request)
+            except exc.TimeoutError:
+                response = self._unavailable()
+            self._add_cors_headers(request, response)
+            if metrics is not None:
+                metrics.observe(
+                    path,
+                    request.method,
+                    response.status_code,
+                    time.perf_counter() - started,
+                    response.content_length
+                )
+            return _to_asgi(response)
+        finally:
+            if metrics is not None:
+                metrics.request_finished()
+
+    def _json(self, payload, status=200):
+        response = self.app.json.response(payload)
+        response.status_code = status
+        return response
+
+    def _unavailable(self):
+        response = self._json(POOL_TIMEOUT_PAYLOAD, 503)
+        response.headers["Retry-After"] = "1"
+        return response
+
+    def _add_cors_headers(self, request, response):
+        # What cors.CORSMiddleware adds to the Flask app's responses.
+        policy = self.app.extensions.get("cors")
+        if policy is None:
+            return
+        response.vary.add("Origin")
+        for name, value in policy.response_headers(request.headers.get("origin")):
+            response.headers[name] = value
+
+    def _session_blocks(self):
+        store = getattr(self.app.session_interface, "store", None)
+        return getattr(store, "blocking", False)
+
+    async def _open_session(self, request):
+        interface = self.app.session_interface
+        if self._session_blocks():
+            return await run_in_threadpool(interface.open_session, self.app, request)
+        return interface.open_session(self.app, request)
+
+    async def _save_session(self, session, response):
+        interface = self.app.session_interface
+        if self._session_blocks():
+            await run_in_threadpool(interface.save_session, self.app, session, response)
+        else:
+            interface.save_session(self.app, session, response)
+
+    async def _current_user(self, request, session):
+        # Flask-Login's lookup order: the session, then the remember cookie.
+        # Session protection only downgrades freshness, which none of these
+        # routes check, so it is not applied here.
+        user_id = session.get("_user_id")
+        if user_id is None and session.get("_remember") != "clear":
+            cookie_name = self.app.config.get("REMEMBER_COOKIE_NAME", COOKIE_NAME)
+            cookie = request.cookies.get(cookie_name)
+            if cookie:
+                user_id = decode_cookie(cookie, key=self.app.secret_key)
+                if user_id is not None:
+                    session["_user_id"] = user_id
+                    session["_fresh"] = False
+        if user_id is None:
+            return None
+
+        user_id = int(user_id)
+        user_cache = self.app.extensions.get("user_cache")
+        if user_cache is not None:
+            cached = user_cache.get(user_id)
+            if cached is not None:
+                return cached
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(
+                select(User.id, User.username).where(User.id == user_id)
+            )).first()
+        if row is None:
+            return None
+        cached = CachedUser(row.id, row.username)
+        if user_cache is not None:
+            user_cache.put(user_id, cached)
+        return cached
+
+    async def _request_data(self, request):
+        # request.json if request.is_json else request.form
+        body = await request.body()
+        mimetype, _ = parse_options_header(request.headers.get("content-type", ""))
+        if mimetype == "application/json" or (
+            mimetype.startswith("application/") and mimetype.endswith("+json")
+        ):
+            try:
+                return json.loads(body)
+            except ValueError as e:
+                raise BadRequest(f"Failed to decode JSON object: {e}")
+        _, form, _ = parse_form_data({
+            "wsgi.input": io.BytesIO(body),
+            "CONTENT_TYPE": request.headers.get("content-type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "REQUEST_METHOD": request.method
+        })
+        return form
+
+    async def save_points(self, request):
+        session = await self._open_session(request)
+        user = await self._current_user(request, session)
+        if user is None:
+            log_event(logger, "points.unauthenticated", level=logging.DEBUG, origin=request.headers.get("origin"))
+            response = self._json({
+                "status": 401,
+                "message": "Authentication required. Please login again."
+            }, 401)
+            await self._save_session(session, response)
+            return response
+
+        try:
+            data = await self._request_data(request)
+            points, error = _parse_points(data)
+
+            if error:
+                response = self._json(error, 406)
+                await self._save_session(session, response)
+                return response
+
+            points_buffer = self.app.extensions.get("points_buffer")
+            if points_buffer:
+                try:
+                    ticket = await run_in_threadpool(points_buffer.submit, user.id, points)
+                except BufferFull:
+                    response = self._json({
+                        "status": 503,
+                        "message": "Server is busy, please retry shortly."
+                    }, 503)
+                    response.headers["Retry-After"] = "1"
+                    await self._save_session(session, response)
+                    return response
+                if ticket:
+                    try:
+                        await run_in_threadpool(ticket.wait, 10)
+                    except TimeoutError:
+                        log_event(logger, "points.pending", level=logging.WARNING, user_id=user.id, points=points)
+                        response = self._json(_points_pending_result(points), 202)
+                        await self._save_session(session, response)
+                        return response
+            else:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(Point).values(points=points, user_id=user.id))
+                    best = (await conn.execute(
+                        record_points_statement(user.id, points, dialect_name=conn.dialect.name)
+                    )).scalar()
+                    bumped = best == points
+                    if bumped:
+                        await conn.execute(bump_version_statement(LEADERBOARD, conn.dialect.name))
+                if bumped:
+                    forget_versions([LEADERBOARD])
+
+            log_event(logger, "points.saved", user_id=user.id, points=points)
+
+            response = self._json({
+                "status": 200,
+                "message": "Points saved successfully!",
+                "points": points
+            })
+        except exc.TimeoutError:
+            raise
+        except Exception as e:
+            logger.exception("Error in save_points")
+            response = self._json({
+                "status": 500,
+                "message": f"Error saving points: {str(e)}"
+            }, 500)
+        await self._save_session(session, response)
+        return response
+
+    async def save_game_score(self, request):
+        session = await self._open_session(request)
+        user = await self._current_user(request, session)
+        if user is None:
+            response = self._json({
+                "status": 401,
+                "message": "Authentication required. Please login again."
+            }, 401)
+            await self._save_session(session, response)
+            return response
+
+        try:
+            data = await self._request_data(request)
+            parsed, error = _parse_game_score(data)
+
+            if error:
+                response = self._json(error, 406)
+                await self._save_session(session, response)
+                return response
+
+            game_type, level, score, completed = parsed
+            async with self.engine.begin() as conn:
+                best_score, points_to_add = (await conn.execute(merge_game_score_statement(
+                    user.id,
+                    game_type,
+                    level,
+                    score,
+                    completed,
+                    dialect_name=conn.dialect.name
+                ))).one()
+                bumped = game_board_versions([(game_type, level)]) if points_to_add > 0 else []
+                if bumped:
+                    await conn.execute(bump_versions_statement(bumped, conn.dialect.name))
+                await conn.execute(touch_user_stats_statement(user.id))
+            forget_versions(bumped)
+
+            response = self._json(_game_score_result(best_score, points_to_add))
+        except exc.TimeoutError:
+            raise
+        except Exception as e:
+            logger.exception("Error in save_game_score")
+            response = self._json({
+                "status": 500,
+                "message": f"Error saving game score: {str(e)}"
+            }, 500)
+        await self._save_session(session, response)
+        return response
+
+    async def check_session(self, request):
+        session = await self._open_session(request)
+        user = await self._current_user(request, session)
+        if user is not None:
+            if not session.permanent:
+                session.permanent = True
+            response = self._json({
+                "status": 200,
+                "authenticated": True,
+                "username": user.username
+            })
+        else:
+            response = self._json({
+                "status": 401,
+                "authenticated": False,
+                "message": "Not authenticated"
+            }, 401)
+        await self._save_session(session, response)
+        return response
+
+    async def leaderboard(self, request):
+        # @conditional(LEADERBOARD) and @cached_response(LEADERBOARD) around
+        # leaderboards.leaderboards().
+        version, updated = await self._version_info(LEADERBOARD)
+        etag = f"{LEADERBOARD}-{version}"
+        if is_not_modified(
+            etag,
+            updated,
+            parse_etags(request.headers.get("if-none-match")),
+            parse_date(request.headers.get("if-modified-since"))
+        ):
+            return add_validators(self.app.response_class(status=304), etag, updated)
+
+        cache = self.app.extensions.get("response_cache")
+        if cache is None:
+            response = await self._leaderboard_page(request)
+        else:
+            key = cache_key(
+                "/leaderboard",
+                {},
+                request.query_params.multi_items(),
+                {LEADERBOARD: version}
+            )
+            response = await self._cached(cache, key, lambda: self._leaderboard_page(request))
+        if response.status_code == 200:
+            add_validators(response, etag, updated)
+        return response
+
+    async def _leaderboard_page(self, request):
+        try:
+            limit = _int_arg(request, "limit", DEFAULT_PAGE_SIZE)
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            cursor = request.query_params.get("cursor")
+
+            decoded = None
+            if cursor:
+                decoded = _decode_cursor(cursor)
+                if decoded is None:
+                    return self._json({
+                        'status': 406,
+                        'message': 'Invalid cursor'
+                    }, 406)
+
+            async with self.engine.connect() as conn:
+                results, next_cursor = _split_page(
+                    (await conn.execute(_page_select(limit, decoded))).all(),
+                    limit
+                )
+                ranked = []
+                if results:
+                    first_id, _, first_points = results[0]
+                    ahead, tied_ahead = (await conn.execute(
+                        _rank_counts_select(first_id, first_points)
+                    )).one()
+                    ranked = _apply_ranks(results, ahead, tied_ahead)
+
+            return self._json({
+                'status': 200,
+                'leaderboard': ranked,
+                'nextCursor': next_cursor
+            })
+        except exc.TimeoutError:
+            raise
+        except Exception as e:
+            return self._json({
+                'status': 500,
+                'message': f'Error fetching leaderboard: {str(e)}'
+            }, 500)
+
+    async def _version_info(self, name):
+        cached = cached_version(name, self.app.config["RESOURCE_VERSION_TTL"])
+        if cached is not None:
+            return cached
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(version_statement(name))).first()
+        return remember_version(name, row)
+
+    async def _backend(self, cache, method, *args):
+        if cache.backend.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    def _cached_response(self, body):
+        mimetype, data = decode_entry(body)
+        return self.app.response_class(data, mimetype=mimetype)
+
+    async def _cached(self, cache, key, compute):
+        # ResponseCache.fetch for the event loop: concurrent misses for a key
+        # await one computation instead of each querying the database.
+        body = await self._backend(cache, cache.backend.get, key)
+        if body is not None:
+            cache.hits += 1
+            return self._cached_response(body)
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            body = await asyncio.shield(flight)
+            if body is None:
+                # The leader failed or produced an uncacheable response.
+                return await compute()
+            cache.hits += 1
+            return self._cached_response(body)
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        cache.misses += 1
+        body = None
+        try:
+            acquired = await self._backend(cache, cache.backend.acquire, key)
+            if not acquired:
+                body = await self._wait_for(cache, key)
+                if body is not None:
+                    return self._cached_response(body)
+            try:
+                response = await compute()
+                if response.status_code == 200:
+                    body = encode_entry(response.mimetype, response.get_data())
+                    await self._backend(cache, cache.backend.set, key, body)
+                return response
+            finally:
+                if acquired:
+                    await self._backend(cache, cache.backend.release, key)
+        finally:
+            del self._flights[key]
+            flight.set_result(body)
+
+    async def _wait_for(self, cache, key):
+        deadline = time.monotonic() + cache.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            body = await self._backend(cache, cache.backend.get, key)
+            if body is not None:
+                return body
+        return None
+
+
+def _int_arg(request, name, default):
+    # request.args.get(name, type=int, default=default)
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _to_asgi(response):
+    asgi_response = Response(response.get_data(), status_code=response.status_code)
+    asgi_response.raw_headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in response.headers.items()
+    ]
+    return asgi_response
+
+
+class PreflightMiddleware:
+    # Answers CORS preflights on the event loop, like cors.CORSMiddleware
+    # does for the Flask app, so they never wait for a WSGI thread.
+    def __init__(self, app, policy):
+        self.app = app
+        self.policy = policy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "OPTIONS":
+            headers = Headers(scope=scope)
+            origin = headers.get("origin")
+            method = headers.get("access-control-request-method")
+            if origin and method:
+                await send({
+                    "type": "http.response.start",
+                    "status": 204,
+                    "headers": [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in self.policy.preflight_headers(
+                            origin,
+                            method,
+                            headers.get("access-control-request-headers")
+                        )
+                    ]
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+        await self.app(scope, receive, send)
+
+
+def create_asgi_app(app):
+    # ASGI entry point: the four hot routes run on the event loop, every
+    # other request goes to the Flask app in a thread. CORS comes from the
+    # policy main.py installs with cors.init_cors.
+    frontend = AsyncFrontend(app)
+    policy = app.extensions.get("cors")
+    # Login and sign-up run on the WSGI threads below, not gunicorn's.
+    app.extensions["password_hasher"].max_pending = default_max_pending(
+        app.config,
+        app.config["ASYNC_WSGI_THREADS"]
+    )
+
+    @contextlib.asynccontextmanager
+    async def lifespan(asgi_app):
+        yield
+        await frontend.dispose()
+
+    asgi_app = Starlette(
+        routes=[
+            frontend.route("/save-points", frontend.save_points, "POST"),
+            frontend.route("/save-game-score", frontend.save_game_score, "POST"),
+            frontend.route("/check-session", frontend.check_session, "GET"),
+            frontend.route("/leaderboard", frontend.leaderboard, "GET"),
+            Mount("/", WSGIMiddleware(app, workers=app.config["ASYNC_WSGI_THREADS"]))
+        ],
+        middleware=[Middleware(PreflightMiddleware, policy=policy)] if policy is not None else [],
+        lifespan=lifespan
+    )
+    asgi_app.state.flask_app = app
+    asgi_app.state.frontend = frontend
+    return asgi_app
@@ -1,19 +1,25 @@
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, current_app, session, make_response
 from flask_login import logout_user, login_user, login_required, current_user
+from sqlalchemy import exists
+from . import db
+from .hashing import HashPoolBusy
+from .logs import log_event
+from .models import Feedback, GameScore, User
+import logging
 
 auth = Blueprint("auth", __name__)
+logger = logging.getLogger(__name__)
 
-@auth.route("/login", methods=["GET", "POST", "OPTIONS"])
+def _busy_response():
+    response = jsonify({
+        "status": 503,
+        "message": "Server is busy, please try again shortly."
+    })
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+@auth.route("/login", methods=["GET", "POST"])
 def login():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
     if request.method == "POST":
         data = request.json if request.is_json else request.form
         username = (
@@ -24,13 +30,25 @@ def login():
         ).strip()
         password = data.get("password")
 
-        from .models import User
-        from . import db
-
         user = User.query.filter_by(username=username).first()
         if user:
-            if check_password_hash(user.password, password):
-                from flask import session, make_response
+            try:
+                password_ok = current_app.extensions["password_hasher"].check(user.password, password)
+            except HashPoolBusy:
+                return _busy_response()
+            
+            if password_ok:
+                password_hasher = current_app.extensions["password_hasher"]
+                if password_hasher.needs_rehash(user.password):
+                    try:
+                        user.password = password_hasher.hash(password)
+                        db.session.commit()
+                    except HashPoolBusy:
+                        pass
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception("Error rehashing password", extra={"fields": {"user_id": user.id}})
+                
                 login_user(user, remember=True)
                 session.permanent = True
                 session.modified = True
@@ -39,25 +57,21 @@ def login():
                 game_progress_result = {"status": 200, "hasCompletedGame": False}
                 
                 try:
-                    from .models import Feedback, GameScore
-                    user_feedback = Feedback.query.filter_by(
-                        user_id=user.id,
-                        game_type=None
-                    ).first()
-                    feedback_result["hasFeedback"] = user_feedback is not None
-                except Exception as e:
-                    print(f"Error checking feedback in login: {str(e)}")
+                    has_feedback, has_completed_game = db.session.query(
+                        exists().where(
+                            Feedback.user_id == user.id,
+                            Feedback.game_type.is_(None)
+                        ),
+                        exists().where(
+                            GameScore.user_id == user.id,
+                            GameScore.completed.is_(True)
+                        )
+                    ).one()
+                    feedback_result["hasFeedback"] = bool(has_feedback)
+                    game_progress_result["hasCompletedGame"] = bool(has_completed_game)
+                except Exception:
+                    logger.exception("Error checking feedback and game progress in login")
                     feedback_result["status"] = 500
-                
-                try:
-                    from .models import GameScore
-                    completed_game = GameScore.query.filter_by(
-                        user_id=user.id,
-                        completed=True
-                    ).first()
-                    game_progress_result["hasCompletedGame"] = completed_game is not None
-                except Exception as e:
-                    print(f"Error checking game progress in login: {str(e)}")
                     game_progress_result["status"] = 500
                 
                 response = make_response(jsonify({
@@ -68,17 +82,7 @@ def login():
                     "gameProgressResult": game_progress_result
                 }))
                 
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
-                
-                print(f"User {user.username} logged in")
-                print(f"Session ID: {session.get('_id', 'N/A')}")
-                print(f"Session keys: {list(session.keys())}")
-                print(f"User authenticated: {user.is_authenticated}")
-                print(f"Session permanent: {session.permanent}")
-                print(f"Response headers: {dict(response.headers)}")
+                log_event(logger, "user.login", user_id=user.id, username=user.username)
                 
                 return response
             else:
@@ -100,12 +104,8 @@ def login():
     })
     return response
 
-@auth.route("/logout", methods=["GET", "OPTIONS"])
+@auth.route("/logout", methods=["GET"])
 def logout():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        return response
-    
     logout_user()
     response = jsonify({
         "status": 200,
@@ -113,31 +113,16 @@ def logout():
     })
     return response
 
-@auth.route("/check-session", methods=["GET", "OPTIONS"])
+@auth.route("/check-session", methods=["GET"])
 def check_session():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from flask import session
-    
     if current_user.is_authenticated:
-        session.permanent = True
-        session.modified = True
+        if not session.permanent:
+            session.permanent = True
         response = jsonify({
             "status": 200,
             "authenticated": True,
             "username": current_user.username
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     else:
         response = jsonify({
@@ -145,22 +130,10 @@ def check_session():
             "authenticated": False,
             "message": "Not authenticated"
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
 
-@auth.route("/sign-up", methods=["GET", "POST", "OPTIONS"])
+@auth.route("/sign-up", methods=["GET", "POST"])
 def sign_up():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
     if request.method == "POST":
         try:
             data = request.json if request.is_json else request.form
@@ -169,9 +142,6 @@ def sign_up():
             password1 = data.get("password1") or ""
             password2 = data.get("password2") or ""
 
-            from .models import User
-            from . import db
-
             user = User.query.filter_by(username=username).first()
 
             if user:
@@ -179,46 +149,30 @@ def sign_up():
                     "status": 406,
                     "message": "Username Already Exist!"
                 })
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
                 return response
             elif len(username) < 4:
                 response = jsonify({
                     "status": 406,
                     "message": "Username must be more than 4 characters."
                 })
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
                 return response
             elif len(password1) < 7:
                 response = jsonify({
                     "status": 406,
                     "message": "Password must contain more than 6 characters."
                 })
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
                 return response
             elif password1 != password2:
                 response = jsonify({
                     "status": 406,
                     "message": "Password don't match!"
                 })
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
                 return response
             else:
-                new_user = User(username=username, password=generate_password_hash(password1, method="pbkdf2:sha256"))
+                password_hash = current_app.extensions["password_hasher"].hash(password1)
+                new_user = User(username=username, password=password_hash)
                 db.session.add(new_user)    
                 db.session.commit()
-                from flask import session, make_response
                 login_user(new_user, remember=True)
                 session.permanent = True
                 session.modified = True
@@ -229,32 +183,19 @@ def sign_up():
                     "username": new_user.username
                 }))
                 
-                origin = request.headers.get("Origin")
-                if origin:
-                    response.headers.add("Access-Control-Allow-Origin", origin)
-                response.headers.add("Access-Control-Allow-Credentials", "true")
-                
                 return response
+        except HashPoolBusy:
+            return _busy_response()
         except Exception as e:
-            import traceback
-            print(f"Error in sign_up: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Error in sign_up")
             response = jsonify({
                 "status": 500,
                 "message": f"Server error: {str(e)}"
             })
-            origin = request.headers.get("Origin")
-            if origin:
-                response.headers.add("Access-Control-Allow-Origin", origin)
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 500
 
     response = jsonify({
         "status": 200,
         "message": "Account Created"
     })
-    origin = request.headers.get("Origin")
-    if origin:
-        response.headers.add("Access-Control-Allow-Origin", origin)
-    response.headers.add("Access-Control-Allow-Credentials", "true")
     return response
\ No newline at end of file
@@ -0,0 +1,83 @@
+from datetime import date, datetime, timedelta, timezone
+import click
+from flask import current_app
+from sqlalchemy import case, delete, func, select
+from . import db
+from .models import Point, PointRollup
+from .pool import disable_statement_timeout
+from .stats import dialect_insert
+
+
+def _rollup_upsert():
+    stmt = dialect_insert(PointRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=[PointRollup.user_id, PointRollup.day],
+        set_={
+            "max_points": case(
+                (stmt.excluded.max_points > PointRollup.max_points, stmt.excluded.max_points),
+                else_=PointRollup.max_points
+            ),
+            "sum_points": PointRollup.sum_points + stmt.excluded.sum_points,
+            "point_count": PointRollup.point_count + stmt.excluded.point_count
+        }
+    )
+
+
+def compact_points(retention_days, chunk_size):
+    # Each chunk is rolled up, deleted and committed on its own, so locks on
+    # the live point table are only ever held for one chunk.
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    compacted = 0
+
+    while True:
+        disable_statement_timeout(db.session.connection())
+        ids = db.session.execute(
+            select(Point.id).where(
+                Point.point_date < cutoff
+            ).order_by(Point.id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        day = func.date(Point.point_date)
+        rollups = db.session.execute(
+            select(
+                Point.user_id,
+                day,
+                func.max(Point.points),
+                func.sum(Point.points),
+                func.count(Point.points)
+            ).where(
+                Point.id.in_(ids),
+                Point.user_id.isnot(None),
+                Point.points.isnot(None)
+            ).group_by(Point.user_id, day)
+        ).all()
+
+        if rollups:
+            db.session.execute(_rollup_upsert(), [{
+                "user_id": user_id,
+                "day": date.fromisoformat(rollup_day) if isinstance(rollup_day, str) else rollup_day,
+                "max_points": max_points,
+                "sum_points": sum_points,
+                "point_count": point_count
+            } for user_id, rollup_day, max_points, sum_points, point_count in rollups])
+
+        db.session.execute(delete(Point).where(Point.id.in_(ids)))
+        db.session.commit()
+        compacted += len(ids)
+
+    return compacted
+
+
+@click.command("compact-points")
+@click.option("--retention-days", type=int, default=None,
+              help="Keep raw point rows newer than this many days.")
+@click.option("--chunk-size", type=int, default=5000,
+              help="Rows rolled up and deleted per transaction.")
+def compact_points_command(retention_days, chunk_size):
+    """Roll old point rows up into per-user daily summaries and delete them."""
+    if retention_days is None:
+        retention_days = current_app.config["POINT_RETENTION_DAYS"]
+    compacted = compact_points(retention_days, chunk_size)
+    click.echo(f"Compacted {compacted} point rows older than {retention_days} days")
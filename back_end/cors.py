@@ -0,0 +1,101 @@
+class CORSPolicy:
+    # Which browser origins may call the API. Credentials are always allowed,
+    # since the frontend authenticates with the session cookie.
+    def __init__(self, origins, methods, allow_headers, expose_headers, max_age=0):
+        self.origins = frozenset(origins)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.allow_headers = frozenset(header.lower() for header in allow_headers)
+        self.max_age = max_age
+        self._allow_methods = ", ".join(methods)
+        self._allow_headers = ", ".join(allow_headers)
+        self._expose_headers = ", ".join(expose_headers)
+
+    def preflight_headers(self, origin, method, request_headers=None):
+        # Headers for the 204 that answers a preflight. A refused preflight
+        # gets no Access-Control-* headers, which makes the browser block the
+        # actual request.
+        headers = [("Vary", "Origin"), ("Content-Length", "0")]
+        requested = {
+            header.strip().lower() for header in (request_headers or "").split(",") if header.strip()
+        }
+        if (
+            origin not in self.origins
+            or method.upper() not in self.methods
+            or not requested <= self.allow_headers
+        ):
+            return headers
+        headers += [
+            ("Access-Control-Allow-Origin", origin),
+            ("Access-Control-Allow-Credentials", "true"),
+            ("Access-Control-Allow-Methods", self._allow_methods),
+            ("Access-Control-Allow-Headers", self._allow_headers)
+        ]
+        if self.max_age:
+            headers.append(("Access-Control-Max-Age", str(self.max_age)))
+        return headers
+
+    def response_headers(self, origin):
+        if origin not in self.origins:
+            return []
+        headers = [
+            ("Access-Control-Allow-Origin", origin),
+            ("Access-Control-Allow-Credentials", "true")
+        ]
+        if self._expose_headers:
+            headers.append(("Access-Control-Expose-Headers", self._expose_headers))
+        return headers
+
+
+def _vary_origin(headers):
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == "vary":
+            headers[index] = (name, f"{value}, Origin")
+            return headers
+    headers.append(("Vary", "Origin"))
+    return headers
+
+
+class CORSMiddleware:
+    # Wraps app.wsgi_app, so a preflight is answered before Flask opens the
+    # session or loads the user, and every other response gets its CORS
+    # headers on the way out. Views don't set any themselves.
+    def __init__(self, wsgi_app, policy):
+        self.wsgi_app = wsgi_app
+        self.policy = policy
+
+    def __call__(self, environ, start_response):
+        origin = environ.get("HTTP_ORIGIN")
+        method = environ.get("HTTP_ACCESS_CONTROL_REQUEST_METHOD")
+        if environ["REQUEST_METHOD"] == "OPTIONS" and origin and method:
+            start_response("204 No Content", self.policy.preflight_headers(
+                origin,
+                method,
+                environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS")
+            ))
+            return []
+
+        cors_headers = self.policy.response_headers(origin)
+
+        def cors_start_response(status, headers, exc_info=None):
+            return start_response(status, _vary_origin(list(headers)) + cors_headers, exc_info)
+
+        return self.wsgi_app(environ, cors_start_response)
+
+
+def init_cors(
+    app,
+    origins,
+    methods=("GET", "POST", "PUT", "DELETE", "OPTIONS"),
+    allow_headers=("Content-Type", "Authorization"),
+    expose_headers=("Set-Cookie",)
+):
+    policy = CORSPolicy(
+        origins,
+        methods,
+        allow_headers,
+        expose_headers,
+        max_age=app.config["CORS_MAX_AGE"]
+    )
+    app.wsgi_app = CORSMiddleware(app.wsgi_app, policy)
+    app.extensions["cors"] = policy
+    return policy
@@ -0,0 +1,118 @@
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # PBKDF2 and scrypt run in hashlib with the GIL released, so a small
+    # thread pool caps how many cores hashing can take without blocking the
+    # worker's other request threads. Callers beyond workers + max_pending
+    # are rejected instead of queueing behind a login burst.
+    def __init__(self, workers=2, max_pending=8, method="pbkdf2:sha256:600000"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.method = method
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Executor threads do not survive a fork, so each process builds its own.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="password-hash"
+                    )
+                    self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+                    self._pid = os.getpid()
+        return self._executor, self._slots
+
+    def _run(self, fn, *args, **kwargs):
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise HashPoolBusy("Password hashing pool is saturated")
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def check(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def needs_rehash(self, pwhash):
+        # Werkzeug stores the fully parameterised method before the first
+        # "$", e.g. "pbkdf2:sha256:600000$salt$hash".
+        return pwhash.split("$", 1)[0] != self.method
+
+
+def password_hash_method(config):
+    algorithm = config["PASSWORD_HASH_ALGORITHM"]
+    if algorithm == "pbkdf2":
+        return f"pbkdf2:{config['PASSWORD_PBKDF2_HASH']}:{config['PASSWORD_PBKDF2_ITERATIONS']}"
+    if algorithm == "scrypt":
+        return f"scrypt:{config['PASSWORD_SCRYPT_N']}:{config['PASSWORD_SCRYPT_R']}:{config['PASSWORD_SCRYPT_P']}"
+    raise ValueError(f"Unknown PASSWORD_HASH_ALGORITHM: {algorithm}")
+
+
+def default_max_pending(config, request_threads):
+    # Hashing callers block a request thread each. Keeping their total
+    # (workers + pending) below the thread count leaves a thread for other
+    # routes, and makes a login burst actually reach the 503.
+    if config["PASSWORD_HASH_MAX_PENDING"] is not None:
+        return config["PASSWORD_HASH_MAX_PENDING"]
+    return max(0, request_threads - 1 - config["PASSWORD_HASH_WORKERS"])
+
+
+def init_password_hasher(app):
+    hasher = PasswordHasher(
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_pending=default_max_pending(app.config, app.config["REQUEST_THREADS"]),
+        method=password_hash_method(app.config)
+    )
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+CALIBRATION_METHODS = [
+    "pbkdf2:sha256:100000",
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+]
+
+
+@click.command("calibrate-password-hash")
+@click.option("--rounds", type=int, default=5, help="Verifications timed per policy.")
+@click.argument("methods", nargs=-1)
+def calibrate_password_hash_command(rounds, methods):
+    """Report password verify time per hash policy on this host."""
+    current = current_app.extensions["password_hasher"].method
+    methods = list(methods) or sorted(set(CALIBRATION_METHODS + [current]))
+    for method in methods:
+        pwhash = generate_password_hash("calibration-password", method=method)
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            check_password_hash(pwhash, "calibration-password")
+            timings.append((time.perf_counter() - started) * 1000.0)
+        marker = " (current)" if method == current else ""
+        click.echo(f"{method:<28} median {statistics.median(timings):8.1f} ms  max {max(timings):8.1f} ms{marker}")
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+
+
+class CachedUser(UserMixin):
+    # What request handlers read from current_user. Kept as a plain object so
+    # it can outlive the session that loaded it.
+    __slots__ = ("id", "username")
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class UserCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def init_user_cache(app, login_manager):
+    from . import db
+    from .models import User
+
+    # Entries are per process; the TTL bounds how long another worker can
+    # keep serving a user row that was changed elsewhere.
+    user_cache = UserCache(
+        maxsize=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"]
+    )
+    app.extensions["user_cache"] = user_cache
+
+    @login_manager.user_loader
+    def load_user(id):
+        user_id = int(id)
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        cached = CachedUser(user.id, user.username)
+        user_cache.put(user_id, cached)
+        return cached
+
+    @event.listens_for(User, "after_update")
+    @event.listens_for(User, "after_delete")
+    def invalidate_user(mapper, connection, target):
+        user_cache.invalidate(target.id)
+
+    return user_cache
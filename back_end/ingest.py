@@ -0,0 +1,216 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import insert
+
+logger = logging.getLogger(__name__)
+
+# A failed batch (a deadlock victim, a dropped connection) is retried this
+# many times in all before its points are given up on.
+FLUSH_ATTEMPTS = 3
+FLUSH_RETRY_DELAY = 0.1
+
+
+class BufferFull(Exception):
+    pass
+
+
+class _Ticket:
+    __slots__ = ("event", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for points to be flushed")
+        if self.error is not None:
+            raise self.error
+
+
+class PointWriteBuffer:
+    # Durability modes:
+    #   "flushed"  - the request waits until the batch holding its event has
+    #                been committed (group commit); nothing acknowledged is lost.
+    #   "buffered" - the request returns as soon as the event is queued; events
+    #                still in the queue are lost if the process dies.
+    DURABILITY_MODES = ("flushed", "buffered")
+
+    def __init__(self, app, interval_ms=200, batch_size=500, max_queue=10000,
+                 durability="flushed", enqueue_timeout_ms=50):
+        if durability not in self.DURABILITY_MODES:
+            raise ValueError(f"Unknown points durability mode: {durability}")
+        self.app = app
+        self.interval = interval_ms / 1000.0
+        self.batch_size = batch_size
+        self.durability = durability
+        self.enqueue_timeout = enqueue_timeout_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _ensure_started(self):
+        # Started lazily, and restarted after a fork, because threads do not
+        # survive into forked gunicorn workers.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="points-flusher", daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, points):
+        self._ensure_started()
+        ticket = _Ticket() if self.durability == "flushed" else None
+        item = (user_id, points, datetime.now(timezone.utc), ticket)
+        try:
+            self._queue.put(item, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise BufferFull("Points queue is full")
+        self.enqueued += 1
+        return ticket
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        self._drain()
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _write(self, batch):
+        # Returns None on success, or the exception the batch failed with.
+        from . import db
+        from .models import Point
+        from .stats import record_user_points
+
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(Point), [
+                    {"user_id": user_id, "points": points, "point_date": point_date}
+                    for user_id, points, point_date, _ in batch
+                ])
+                per_user = {}
+                for user_id, points, _, _ in batch:
+                    best, total = per_user.get(user_id, (points, 0))
+                    per_user[user_id] = (max(best, points), total + points)
+                record_user_points(per_user)
+                db.session.commit()
+                return None
+            except Exception as e:
+                db.session.rollback()
+                return e
+            finally:
+                db.session.remove()
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            error = self._write(batch)
+            if error is None:
+                break
+            self.flush_errors += 1
+            logger.error(
+                "Error flushing buffered points",
+                exc_info=error,
+                extra={"fields": {"rows": len(batch), "attempt": attempt, "retrying": attempt < FLUSH_ATTEMPTS}}
+            )
+            if attempt < FLUSH_ATTEMPTS:
+                time.sleep(FLUSH_RETRY_DELAY * attempt)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.flush_count += 1
+        self.last_flush_ms = elapsed_ms
+        self.total_flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        if error is None:
+            self.flushed_rows += len(batch)
+
+        for _, _, _, ticket in batch:
+            if ticket is not None:
+                ticket.error = error
+                ticket.event.set()
+
+    def stop(self, timeout=10.0):
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queueDepth": self._queue.qsize(),
+            "queueCapacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushedRows": self.flushed_rows,
+            "flushes": self.flush_count,
+            "flushErrors": self.flush_errors,
+            "lastFlushMs": round(self.last_flush_ms, 3),
+            "maxFlushMs": round(self.max_flush_ms, 3),
+            "avgFlushMs": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0
+        }
+
+
+def init_points_buffer(app):
+    if not app.config.get("POINTS_WRITE_BEHIND"):
+        return None
+    buffer = PointWriteBuffer(
+        app,
+        interval_ms=app.config["POINTS_FLUSH_INTERVAL_MS"],
+        batch_size=app.config["POINTS_FLUSH_BATCH_SIZE"],
+        max_queue=app.config["POINTS_QUEUE_SIZE"],
+        durability=app.config["POINTS_DURABILITY"],
+        enqueue_timeout_ms=app.config["POINTS_ENQUEUE_TIMEOUT_MS"]
+    )
+    app.extensions["points_buffer"] = buffer
+    atexit.register(buffer.stop)
+    return buffer
@@ -1,39 +1,295 @@
-from flask import Blueprint, jsonify
-from sqlalchemy import func
+from flask import Blueprint, jsonify, request
+from flask_login import current_user
+from sqlalchemy import and_, case, func, or_, select
 from . import db
-from .models import User, Point
+from .models import GameScore, User, UserStats
+from .responsecache import cached_response
+from .versions import LEADERBOARD, bump_versions, conditional, game_board
 
 leaderboard = Blueprint("leaderboard", __name__)
 
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+DEFAULT_AROUND = 5
+MAX_AROUND = 25
+
+
+def _board_select():
+    return select(
+        User.id,
+        User.username,
+        UserStats.best_points
+    ).join(
+        UserStats, User.id == UserStats.user_id
+    )
+
+
+def _page_select(limit, cursor=None):
+    # Fetches one row past the page so the caller can tell whether there is
+    # a next page.
+    stmt = _board_select()
+    if cursor is not None:
+        cursor_points, cursor_user_id = cursor
+        # The sort directions are mixed, so a row-value comparison won't do;
+        # the extra bound lets the scan of ix_user_stats_rank start at the
+        # cursor instead of filtering its way down to it.
+        stmt = stmt.where(
+            UserStats.best_points <= cursor_points,
+            or_(
+                UserStats.best_points < cursor_points,
+                and_(UserStats.best_points == cursor_points, UserStats.user_id > cursor_user_id)
+            )
+        )
+    return stmt.order_by(
+        UserStats.best_points.desc(),
+        UserStats.user_id
+    ).limit(limit + 1)
+
+
+def _split_page(results, limit):
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last_user_id, _, last_points = results[-1]
+        next_cursor = _encode_cursor(last_points, last_user_id)
+    return results, next_cursor
+
+
+def _rank_counts_select(first_id, first_points):
+    return select(
+        func.coalesce(func.sum(case((UserStats.best_points > first_points, 1), else_=0)), 0),
+        func.coalesce(func.sum(case(
+            (and_(UserStats.best_points == first_points, UserStats.user_id < first_id), 1),
+            else_=0
+        )), 0)
+    ).where(
+        UserStats.best_points >= first_points
+    )
+
+
+def _apply_ranks(rows, ahead, tied_ahead):
+    # Rows arrive in board order (best_points DESC, user_id ASC). Ranks use
+    # standard competition ranking, so ties share a rank. Two index-backed
+    # counts anchored on the first row are enough to rank the whole slice.
+    if not rows:
+        return []
+
+    first_points = rows[0][2]
+    first_rank = int(ahead) + 1
+    first_position = first_rank + int(tied_ahead)
+
+    ranked = []
+    rank = first_rank
+    previous_points = first_points
+    for offset, (user_id, username, points) in enumerate(rows):
+        if points != previous_points:
+            rank = first_position + offset
+            previous_points = points
+        ranked.append({
+            'rank': rank,
+            'username': username,
+            'points': int(points) if points else 0
+        })
+    return ranked
+
+
+def _ranked(rows):
+    if not rows:
+        return []
+    first_id, _, first_points = rows[0]
+    ahead, tied_ahead = db.session.execute(_rank_counts_select(first_id, first_points)).one()
+    return _apply_ranks(rows, ahead, tied_ahead)
+
+
+def _encode_cursor(points, user_id):
+    return f"{points}:{user_id}"
+
+
+def _decode_cursor(cursor):
+    try:
+        points, user_id = cursor.split(":", 1)
+        return int(points), int(user_id)
+    except (AttributeError, ValueError):
+        return None
+
+
 @leaderboard.route("/leaderboard", methods=["GET"])
+@conditional(LEADERBOARD)
+@cached_response(LEADERBOARD)
 def leaderboards():
     try:
+        limit = request.args.get("limit", type=int, default=DEFAULT_PAGE_SIZE)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        cursor = request.args.get("cursor")
+
+        decoded = None
+        if cursor:
+            decoded = _decode_cursor(cursor)
+            if decoded is None:
+                return jsonify({
+                    'status': 406,
+                    'message': 'Invalid cursor'
+                }), 406
+
+        results, next_cursor = _split_page(
+            db.session.execute(_page_select(limit, decoded)).all(),
+            limit
+        )
+
+        return jsonify({
+            'status': 200,
+            'leaderboard': _ranked(results),
+            'nextCursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 500,
+            'message': f'Error fetching leaderboard: {str(e)}'
+        }), 500
+
+
+@leaderboard.route("/leaderboard/me", methods=["GET"])
+def my_rank():
+    if not current_user.is_authenticated:
+        return jsonify({
+            'status': 401,
+            'message': 'Authentication required. Please login again.'
+        }), 401
+
+    try:
+        around = request.args.get("around", type=int, default=DEFAULT_AROUND)
+        around = max(0, min(around, MAX_AROUND))
+
+        my_points = db.session.query(UserStats.best_points).filter(
+            UserStats.user_id == current_user.id
+        ).scalar()
+
+        if my_points is None:
+            return jsonify({
+                'status': 200,
+                'rank': None,
+                'points': 0,
+                'above': [],
+                'below': []
+            })
+
+        above = db.session.execute(_board_select().where(
+            UserStats.best_points >= my_points,
+            or_(
+                UserStats.best_points > my_points,
+                and_(UserStats.best_points == my_points, UserStats.user_id < current_user.id)
+            )
+        ).order_by(
+            UserStats.best_points.asc(),
+            UserStats.user_id.desc()
+        ).limit(around)).all() if around else []
+        above.reverse()
+
+        below = db.session.execute(_board_select().where(
+            UserStats.best_points <= my_points,
+            or_(
+                UserStats.best_points < my_points,
+                and_(UserStats.best_points == my_points, UserStats.user_id > current_user.id)
+            )
+        ).order_by(
+            UserStats.best_points.desc(),
+            UserStats.user_id
+        ).limit(around)).all() if around else []
+
+        rows = above + [(current_user.id, current_user.username, my_points)] + below
+        ranked = _ranked(rows)
+        me = ranked[len(above)]
+
+        return jsonify({
+            'status': 200,
+            'rank': me['rank'],
+            'points': me['points'],
+            'above': ranked[:len(above)],
+            'below': ranked[len(above) + 1:]
+        })
+    except Exception as e:
+        return jsonify({
+            'status': 500,
+            'message': f'Error fetching rank: {str(e)}'
+        }), 500
+
+
+def game_board_versions(boards):
+    # Version names to bump for new best scores on (game_type, level)
+    # boards: the level's board and the game's overall board. Sorted, so
+    # concurrent transactions lock the version rows in the same order.
+    names = set()
+    for game_type, level in boards:
+        names.add(game_board(game_type, level))
+        names.add(game_board(game_type))
+    return sorted(names)
+
+
+def bump_game_boards(boards):
+    # Runs inside the transaction that recorded the new best scores.
+    bump_versions(game_board_versions(boards))
+
+
+def _game_board(game_type, level, limit):
+    if level is None:
+        score = func.sum(GameScore.best_score).label('score')
         results = db.session.query(
-            User.id,
             User.username,
-            func.max(Point.points).label('total_points')
+            score
         ).join(
-            Point, User.id == Point.user_id
+            GameScore, User.id == GameScore.user_id
+        ).filter(
+            GameScore.game_type == game_type
         ).group_by(
             User.id, User.username
         ).order_by(
-            func.max(Point.points).desc()
-        ).limit(10).all()
-        
-        leaderboard_data = []
-        for rank, (user_id, username, total_points) in enumerate(results, start=1):
-            leaderboard_data.append({
-                'rank': rank,
-                'username': username,
-                'points': int(total_points) if total_points else 0
-            })
-        
+            score.desc(),
+            User.id
+        ).limit(limit).all()
+    else:
+        results = db.session.query(
+            User.username,
+            GameScore.best_score
+        ).join(
+            User, User.id == GameScore.user_id
+        ).filter(
+            GameScore.game_type == game_type,
+            GameScore.level == level
+        ).order_by(
+            GameScore.best_score.desc(),
+            GameScore.user_id
+        ).limit(limit).all()
+
+    board = []
+    previous_score = None
+    for position, (username, score) in enumerate(results, start=1):
+        if score != previous_score:
+            rank = position
+            previous_score = score
+        board.append({
+            'rank': rank,
+            'username': username,
+            'score': int(score) if score else 0
+        })
+    return board
+
+
+@leaderboard.route("/leaderboard/<game_type>", methods=["GET"])
+@leaderboard.route("/leaderboard/<game_type>/<int:level>", methods=["GET"])
+@cached_response(lambda game_type, level=None: [game_board(game_type, level)])
+def game_leaderboard(game_type, level=None):
+    try:
+        limit = request.args.get("limit", type=int, default=DEFAULT_PAGE_SIZE)
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
         return jsonify({
             'status': 200,
-            'leaderboard': leaderboard_data
+            'gameType': game_type,
+            'level': level,
+            'leaderboard': _game_board(game_type, level, limit)
         })
     except Exception as e:
         return jsonify({
             'status': 500,
             'message': f'Error fetching leaderboard: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
@@ -0,0 +1,150 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from flask import has_request_context, request
+
+REDACTED = "[redacted]"
+SENSITIVE_KEYS = ("cookie", "password", "secret", "token", "authorization", "session", "set-cookie")
+
+_sample_rates = {}
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if any(word in str(key).lower() for word in SENSITIVE_KEYS) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        endpoint = getattr(record, "endpoint", None)
+        if endpoint:
+            entry["endpoint"] = endpoint
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(redact(fields))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class EndpointLevelFilter(logging.Filter):
+    # Tags records with the Flask endpoint and applies per-endpoint minimum
+    # levels, e.g. {"views.save_points": logging.WARNING}.
+    def __init__(self, levels):
+        super().__init__()
+        self.levels = levels
+
+    def filter(self, record):
+        endpoint = request.endpoint if has_request_context() else None
+        record.endpoint = endpoint
+        return record.levelno >= self.levels.get(endpoint, logging.NOTSET)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the request thread: when the queue is full the record is
+    # dropped and counted. The listener thread is (re)started lazily so it
+    # exists in every forked worker.
+    def __init__(self, log_queue, target):
+        super().__init__(log_queue)
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only resolve the message
+        # here so later mutation of the arguments can't change it.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+def _parse_mapping(value, convert):
+    mapping = {}
+    for part in (value or "").split(","):
+        if "=" in part:
+            key, item = part.split("=", 1)
+            mapping[key.strip()] = convert(item.strip())
+    return mapping
+
+
+def init_logging(app):
+    global _sample_rates
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+
+    if app.config["LOG_HANDLER"] == "sync":
+        handler = stream
+    else:
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=app.config["LOG_QUEUE_SIZE"]), stream)
+        atexit.register(handler.stop)
+    handler.addFilter(EndpointLevelFilter(
+        _parse_mapping(app.config["LOG_ENDPOINT_LEVELS"], lambda level: logging.getLevelName(level.upper()))
+    ))
+    _sample_rates = _parse_mapping(app.config["LOG_SAMPLE_RATES"], float)
+
+    root = logging.getLogger("back_end")
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config["LOG_LEVEL"].upper())
+    root.propagate = False
+    app.extensions["log_handler"] = handler
+    return handler
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    # For high-volume events: LOG_SAMPLE_RATES can keep only a fraction of
+    # them. The level and sampling checks run before any record is built.
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(event, 1.0)
+    if rate < 1.0 and random.random() >= rate:
+        return
+    fields["event"] = event
+    if rate < 1.0:
+        fields["sample_rate"] = rate
+    logger.log(level, event, extra={"fields": fields})
@@ -0,0 +1,339 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from flask import Blueprint, Response, current_app, request
+
+metrics = Blueprint("metrics", __name__)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Final counters of workers that have exited, folded together by
+# mark_process_dead().
+EXITED_SNAPSHOT = "metrics-exited.json"
+
+
+class MetricsRegistry:
+    # Per-process counters. With a shared directory configured, each process
+    # periodically snapshots its counters to <dir>/metrics-<pid>.json and
+    # /metrics sums the snapshots of every process, so scrapes reaching any
+    # gunicorn worker report the whole server. Counters and histograms keep
+    # the final values of exited workers; gauges only count live ones.
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._latency = {}
+        self._status = {}
+        self._size = {}
+        self._in_flight = 0
+        self._collectors = {"counter": [], "gauge": []}
+        self._next_flush = 0.0
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # A forked worker must not report its parent's counters as its own.
+        self._pid = os.getpid()
+        self._latency = {}
+        self._status = {}
+        self._size = {}
+        self._in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            self._in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def observe(self, route, method, status, seconds, size):
+        key = f"{route}\t{method}"
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            latency[-1] += seconds
+            status_key = f"{key}\t{status}"
+            self._status[status_key] = self._status.get(status_key, 0) + 1
+            if size is not None:
+                sizes = self._size.get(key)
+                if sizes is None:
+                    sizes = self._size[key] = [0, 0]
+                sizes[0] += size
+                sizes[1] += 1
+        if self.directory and time.monotonic() >= self._next_flush:
+            self.flush(wait=False)
+
+    def register_collector(self, collector, kind="gauge"):
+        # collector() returns {"metric_name": value}; values are summed
+        # across processes. kind is "counter" for monotonic totals or
+        # "gauge" for current state.
+        self._collectors[kind].append(collector)
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                "latency": {key: list(value) for key, value in self._latency.items()},
+                "status": dict(self._status),
+                "size": {key: list(value) for key, value in self._size.items()},
+                "in_flight": self._in_flight
+            }
+        for kind, collectors in self._collectors.items():
+            values = data[f"{kind}s"] = {}
+            for collector in collectors:
+                try:
+                    values.update(collector())
+                except Exception:
+                    pass
+        return data
+
+    def flush(self, wait=True):
+        # One flush at a time per process, so an older snapshot never
+        # replaces a newer one. Request threads (wait=False) skip the flush
+        # if another thread is already writing. Metrics must never fail a
+        # request, so I/O errors are only logged.
+        if not self._flush_lock.acquire(blocking=wait):
+            return
+        try:
+            self._next_flush = time.monotonic() + self.flush_interval
+            _write_snapshot(os.path.join(self.directory, f"metrics-{os.getpid()}.json"), self.snapshot())
+        except OSError:
+            logger.exception("Error writing metrics snapshot")
+        finally:
+            self._flush_lock.release()
+
+    def _snapshots(self):
+        if not self.directory:
+            yield True, self.snapshot()
+            return
+        self.flush()
+        for name in os.listdir(self.directory):
+            pid = _snapshot_pid(name)
+            if pid is None and name != EXITED_SNAPSHOT:
+                continue
+            data = _load_snapshot(os.path.join(self.directory, name))
+            if data is not None:
+                yield pid is not None and _pid_alive(pid), data
+
+    def render(self):
+        totals = _empty_totals()
+        gauges = {}
+        in_flight = 0
+        for alive, data in self._snapshots():
+            _merge_totals(totals, data)
+            # Gauges describe live state, so exited workers don't count.
+            if alive:
+                in_flight += data["in_flight"]
+                for name, value in data["gauges"].items():
+                    gauges[name] = gauges.get(name, 0) + value
+        latency, status, size, counters = (
+            totals["latency"], totals["status"], totals["size"], totals["counters"]
+        )
+
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram"
+        ]
+        for key in sorted(latency):
+            route, method = key.split("\t")
+            labels = f'route="{route}",method="{method}"'
+            values = latency[key]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += values[len(LATENCY_BUCKETS)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {values[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines.append("# HELP http_requests_total Requests by route and status code.")
+        lines.append("# TYPE http_requests_total counter")
+        for key in sorted(status):
+            route, method, code = key.split("\t")
+            lines.append(f'http_requests_total{{route="{route}",method="{method}",status="{code}"}} {status[key]}')
+
+        lines.append("# HELP http_response_size_bytes Response body sizes by route.")
+        lines.append("# TYPE http_response_size_bytes summary")
+        for key in sorted(size):
+            route, method = key.split("\t")
+            labels = f'route="{route}",method="{method}"'
+            lines.append(f"http_response_size_bytes_sum{{{labels}}} {size[key][0]}")
+            lines.append(f"http_response_size_bytes_count{{{labels}}} {size[key][1]}")
+
+        lines.append("# HELP http_requests_in_flight Requests currently being served.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {in_flight}")
+
+        for name in sorted(counters):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counters[name]}")
+        for name in sorted(gauges):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {gauges[name]}")
+        return "\n".join(lines) + "\n"
+
+
+def _empty_totals():
+    return {"latency": {}, "status": {}, "size": {}, "counters": {}}
+
+
+def _merge_totals(totals, data):
+    # Adds a snapshot's cumulative values (everything but gauges) to totals.
+    for key, values in data["latency"].items():
+        merged = totals["latency"].setdefault(key, [0] * len(values))
+        for index, value in enumerate(values):
+            merged[index] += value
+    for key, count in data["status"].items():
+        totals["status"][key] = totals["status"].get(key, 0) + count
+    for key, values in data["size"].items():
+        merged = totals["size"].setdefault(key, [0, 0])
+        merged[0] += values[0]
+        merged[1] += values[1]
+    for name, value in data.get("counters", {}).items():
+        totals["counters"][name] = totals["counters"].get(name, 0) + value
+
+
+def _snapshot_pid(name):
+    if not (name.startswith("metrics-") and name.endswith(".json")):
+        return None
+    try:
+        return int(name[len("metrics-"):-len(".json")])
+    except ValueError:
+        return None
+
+
+def _load_snapshot(path):
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path, data):
+    # Each write gets its own temp file; the hidden prefix keeps it out of
+    # the snapshot listing.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".metrics-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as snapshot_file:
+            json.dump(data, snapshot_file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def mark_process_dead(directory, pid):
+    # Called by the gunicorn master when a worker exits. Folds the worker's
+    # final counters into EXITED_SNAPSHOT and removes its file, so they
+    # survive even if the pid is reused by a later worker.
+    path = os.path.join(directory, f"metrics-{pid}.json")
+    data = _load_snapshot(path)
+    if data is None:
+        return
+    exited_path = os.path.join(directory, EXITED_SNAPSHOT)
+    exited = _load_snapshot(exited_path) or _empty_totals()
+    _merge_totals(exited, data)
+    exited.update(gauges={}, in_flight=0)
+    _write_snapshot(exited_path, exited)
+    os.remove(path)
+
+
+def clear_metrics_dir(directory):
+    # Called once when the gunicorn master starts: snapshots left by an
+    # earlier server would otherwise be counted, or overwritten by a worker
+    # that happens to get the same pid.
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith(("metrics-", ".metrics-")):
+            os.remove(os.path.join(directory, name))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def init_metrics(app):
+    directory = app.config["METRICS_DIR"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    registry = MetricsRegistry(directory=directory, flush_interval=app.config["METRICS_FLUSH_INTERVAL"])
+    app.extensions["metrics"] = registry
+
+    @app.before_request
+    def start_timer():
+        request.environ["metrics.started"] = time.perf_counter()
+        registry.request_started()
+
+    @app.after_request
+    def record_request(response):
+        started = request.environ.get("metrics.started")
+        if started is not None:
+            rule = request.url_rule
+            registry.observe(
+                rule.rule if rule is not None else "unmatched",
+                request.method,
+                response.status_code,
+                time.perf_counter() - started,
+                response.content_length
+            )
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if "metrics.started" in request.environ:
+            registry.request_finished()
+
+    points_buffer = app.extensions.get("points_buffer")
+    if points_buffer is not None:
+        registry.register_collector(lambda: {
+            "points_rejected": points_buffer.rejected,
+            "points_flushes": points_buffer.flush_count
+        }, kind="counter")
+        registry.register_collector(lambda: {
+            "points_queue_depth": points_buffer.stats()["queueDepth"],
+            "points_flush_last_seconds": points_buffer.last_flush_ms / 1000.0,
+            "points_flush_max_seconds": points_buffer.max_flush_ms / 1000.0
+        })
+
+    user_cache = app.extensions.get("user_cache")
+    if user_cache is not None:
+        registry.register_collector(lambda: {
+            "user_cache_hits": user_cache.hits,
+            "user_cache_misses": user_cache.misses
+        }, kind="counter")
+
+    response_cache = app.extensions.get("response_cache")
+    if response_cache is not None:
+        registry.register_collector(lambda: {
+            "response_cache_hits": response_cache.hits,
+            "response_cache_misses": response_cache.misses
+        }, kind="counter")
+
+    return registry
+
+
+@metrics.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(
+        current_app.extensions["metrics"].render(),
+        mimetype="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,116 @@
+import logging
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, exc, func, inspect, select, text
+from . import db
+from .pool import disable_statement_timeout
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every worker.
+MIGRATION_LOCK_KEY = 0x6E657774
+
+# Kept out of db.metadata so that only this module ever creates it.
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_date", DateTime(timezone=True), server_default=func.now())
+)
+
+
+def _create_tables(conn):
+    # create_all() skips tables that already exist, so indexes added to
+    # existing models have to be created explicitly.
+    db.metadata.create_all(conn)
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _widen_password_column(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    length = conn.execute(text("""
+        SELECT character_maximum_length
+        FROM information_schema.columns
+        WHERE table_name = 'user' AND column_name = 'password'
+    """)).scalar()
+    if length and length < 200:
+        conn.execute(text("ALTER TABLE \"user\" ALTER COLUMN password TYPE VARCHAR(200)"))
+
+
+def _add_game_score_last_points_added(conn):
+    columns = [column["name"] for column in inspect(conn).get_columns("game_score")]
+    if "last_points_added" not in columns:
+        conn.execute(text("ALTER TABLE game_score ADD COLUMN last_points_added INTEGER DEFAULT 0"))
+
+
+def _widen_resource_version_name(conn):
+    # Game board versions are named after the game type and level.
+    if conn.dialect.name != "postgresql":
+        return
+    length = conn.execute(text("""
+        SELECT character_maximum_length
+        FROM information_schema.columns
+        WHERE table_name = 'resource_version' AND column_name = 'name'
+    """)).scalar()
+    if length and length < 100:
+        conn.execute(text("ALTER TABLE resource_version ALTER COLUMN name TYPE VARCHAR(100)"))
+
+
+def _rebuild_user_completion_hall_index(conn):
+    # Recreated with id DESC to match the hall of fame's ORDER BY.
+    from .models import UserCompletion
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_user_completion_hall"))
+    for index in UserCompletion.__table__.indexes:
+        if index.name == "ix_user_completion_hall":
+            index.create(conn)
+
+
+# Append new steps with the next version number; never edit or reorder
+# applied ones. Steps must tolerate databases created before this runner
+# existed, which start at version 0.
+MIGRATIONS = [
+    (1, "create tables and indexes", _create_tables),
+    (2, "widen user.password to VARCHAR(200)", _widen_password_column),
+    (3, "add game_score.last_points_added", _add_game_score_last_points_added),
+    (4, "widen resource_version.name to VARCHAR(100)", _widen_resource_version_name),
+    (5, "rebuild ix_user_completion_hall with id DESC", _rebuild_user_completion_hall_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_schema_version(conn):
+    try:
+        return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except (exc.ProgrammingError, exc.OperationalError):
+        conn.rollback()
+        return 0
+
+
+def run_migrations(engine):
+    # Warm boots cost a single query. Otherwise the pending steps run in one
+    # transaction under an advisory lock, so concurrently booting workers
+    # wait for the first one and then find nothing left to do.
+    with engine.connect() as conn:
+        if current_schema_version(conn) >= LATEST_VERSION:
+            return LATEST_VERSION
+
+    with engine.begin() as conn:
+        # Index builds and workers waiting on the lock may both outlast
+        # DB_STATEMENT_TIMEOUT_MS.
+        disable_statement_timeout(conn)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        schema_version.create(conn, checkfirst=True)
+        current = current_schema_version(conn)
+        for version, name, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(conn)
+            conn.execute(schema_version.insert().values(version=version, name=name))
+            logger.info("Applied schema migration", extra={"fields": {"version": version, "migration": name}})
+            current = version
+    return current
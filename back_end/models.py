@@ -33,6 +33,7 @@ class UserCompletion(db.Model):
     all_completed = db.Column(db.Boolean, default=False)
     completed_date = db.Column(db.DateTime(timezone=True), nullable=True)
     updated_date = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    __table_args__ = (db.Index('ix_user_completion_hall', 'all_completed', completed_date.desc(), id.desc()),)
 
 class GameScore(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,8 +42,14 @@ class GameScore(db.Model):
     level = db.Column(db.Integer)
     best_score = db.Column(db.Integer, default=0)
     completed = db.Column(db.Boolean, default=False)
+    # Points the most recent submission added over the previous best; set by
+    # the upsert so the gain is computed against the locked row.
+    last_points_added = db.Column(db.Integer, default=0)
     updated_date = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
-    __table_args__ = (db.UniqueConstraint('user_id', 'game_type', 'level', name='unique_user_game_level'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'game_type', 'level', name='unique_user_game_level'),
+        db.Index('ix_game_score_board', 'game_type', 'level', best_score.desc()),
+    )
 
 class Feedback(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -52,4 +59,48 @@ class Feedback(db.Model):
     stars = db.Column(db.Integer)  # 1-5 stars
     comment = db.Column(db.Text)
     created_date = db.Column(db.DateTime(timezone=True), default=func.now())
-    user = db.relationship("User", backref="feedbacks")
\ No newline at end of file
+    user = db.relationship("User", backref="feedbacks")
+    __table_args__ = (
+        db.Index(
+            'ix_feedback_overall', created_date.desc(), id.desc(),
+            postgresql_where=game_type.is_(None),
+            sqlite_where=game_type.is_(None)
+        ),
+    )
+class UserStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    best_points = db.Column(db.Integer, default=0, nullable=False)
+    total_points = db.Column(db.Integer, default=0, nullable=False)
+    updated_date = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    user = db.relationship("User", backref=db.backref("stats", uselist=False))
+    __table_args__ = (db.Index('ix_user_stats_rank', best_points.desc(), user_id),)
+
+class PointRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    day = db.Column(db.Date)
+    max_points = db.Column(db.Integer, default=0)
+    sum_points = db.Column(db.Integer, default=0)
+    point_count = db.Column(db.Integer, default=0)
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='unique_user_rollup_day'),)
+
+class ResourceVersion(db.Model):
+    # Monotonic counters bumped whenever a cached resource changes, so every
+    # process can tell whether its copy is stale with one primary-key lookup.
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_date = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+class FeedbackStats(db.Model):
+    # Running rating counters per feedback game_type; "" holds overall
+    # feedback (game_type NULL). Updated in the same transaction as the
+    # feedback row itself.
+    game_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    stars_total = db.Column(db.Integer, default=0, nullable=False)
+    stars_1 = db.Column(db.Integer, default=0, nullable=False)
+    stars_2 = db.Column(db.Integer, default=0, nullable=False)
+    stars_3 = db.Column(db.Integer, default=0, nullable=False)
+    stars_4 = db.Column(db.Integer, default=0, nullable=False)
+    stars_5 = db.Column(db.Integer, default=0, nullable=False)
+    updated_date = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
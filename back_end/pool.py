@@ -0,0 +1,154 @@
+import time
+from flask import g, has_request_context, jsonify
+from sqlalchemy import exc, text
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool that records how long checkouts wait for a connection and how
+    # often they give up after pool_timeout.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            if has_request_context():
+                g._pool_timeout = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self):
+        return {
+            "size": self.size(),
+            "capacity": self.size() + max(self._max_overflow, 0),
+            "checkedOut": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "waitSeconds": self.wait_seconds,
+            "maxWaitSeconds": self.max_wait_seconds,
+            "timeouts": self.timeouts
+        }
+
+
+POOL_TIMEOUT_PAYLOAD = {
+    "status": 503,
+    "message": "Server is busy, please try again shortly."
+}
+
+
+def engine_options(app):
+    # SQLALCHEMY_ENGINE_OPTIONS for the configured database. SQLite keeps
+    # SQLAlchemy's defaults; its pools don't take these settings.
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return {}
+    options = async_engine_options(app)
+    options["poolclass"] = TimedQueuePool
+    return options
+
+
+def async_engine_options(app):
+    # The async engine keeps SQLAlchemy's async-adapted queue pool, sized and
+    # timed out by the same settings.
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return {}
+    options = {
+        "pool_size": app.config["DB_POOL_SIZE"],
+        "max_overflow": app.config["DB_MAX_OVERFLOW"],
+        "pool_timeout": app.config["DB_POOL_TIMEOUT"],
+        "pool_recycle": app.config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": app.config["DB_POOL_PRE_PING"]
+    }
+    statement_timeout = app.config["DB_STATEMENT_TIMEOUT_MS"]
+    if statement_timeout:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def disable_statement_timeout(conn):
+    # DB_STATEMENT_TIMEOUT_MS is sized for requests. Migrations, backfills
+    # and compaction call this at the start of each of their transactions;
+    # SET LOCAL ends with the transaction, so pooled connections keep the
+    # limit.
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+
+
+def dispose_engine_after_fork(app):
+    # For servers that fork after create_app() (gunicorn --preload): the child
+    # must not reuse connections opened by the parent. close=False leaves the
+    # parent's sockets alone and just gives this process a fresh pool.
+    from . import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def async_database_url(url):
+    if url.startswith("postgresql+psycopg://"):
+        return url.replace("postgresql+psycopg://", "postgresql+psycopg_async://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def _unavailable_response():
+    response = jsonify(POOL_TIMEOUT_PAYLOAD)
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def init_pool_telemetry(app):
+    from . import db
+
+    # Handlers catch Exception and answer 500, so a checkout timeout is
+    # remembered on g and the response is replaced here instead.
+    @app.after_request
+    def pool_timeout_response(response):
+        if g.get("_pool_timeout"):
+            return _unavailable_response()
+        return response
+
+    @app.errorhandler(exc.TimeoutError)
+    def pool_timeout_error(error):
+        return _unavailable_response()
+
+    with app.app_context():
+        engine = db.engine
+    if not isinstance(engine.pool, TimedQueuePool):
+        return
+
+    metrics = app.extensions.get("metrics")
+    if metrics is not None:
+        # Read through the engine, since dispose() after a fork swaps in a
+        # new pool.
+        def pool_counters():
+            stats = engine.pool.stats()
+            return {
+                "db_pool_checkouts": stats["checkouts"],
+                "db_pool_checkout_wait_seconds": round(stats["waitSeconds"], 6),
+                "db_pool_timeouts": stats["timeouts"]
+            }
+
+        def pool_gauges():
+            stats = engine.pool.stats()
+            return {
+                "db_pool_size": stats["size"],
+                "db_pool_capacity": stats["capacity"],
+                "db_pool_checked_out": stats["checkedOut"],
+                "db_pool_overflow": stats["overflow"]
+            }
+        metrics.register_collector(pool_counters, kind="counter")
+        metrics.register_collector(pool_gauges)
@@ -0,0 +1,232 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+from .versions import version_info
+
+
+def cache_key(rule, view_args, args, versions):
+    # view_args: {name: value}; args: [(name, value)] with repeats;
+    # versions: {resource: version}.
+    view_args = "&".join(f"{name}={value}" for name, value in sorted(view_args.items()))
+    args = "&".join(f"{name}={value}" for name, value in sorted(args))
+    versions = ",".join(f"{name}={version}" for name, version in versions.items())
+    return f"{rule}|{view_args}|{args}|{versions}"
+
+
+def encode_entry(mimetype, data):
+    return f"{mimetype}\n".encode() + data
+
+
+def decode_entry(body):
+    mimetype, data = body.split(b"\n", 1)
+    return mimetype.decode(), data
+
+
+class LocalResponseCache:
+    # Per-process LRU of rendered response bodies.
+    blocking = False
+
+    def __init__(self, maxsize=512, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def acquire(self, key):
+        # Recomputation within one process is already deduplicated by
+        # SingleFlight.
+        return True
+
+    def release(self, key):
+        pass
+
+
+class RedisResponseCache:
+    # Shared by every worker. acquire() takes a short-lived lock key so that
+    # only one process recomputes an expired entry.
+    blocking = True
+
+    def __init__(self, client, prefix="response:", ttl=60, lock_ms=5000):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.lock_ms = lock_ms
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def acquire(self, key):
+        return bool(self.client.set(f"{self.prefix}lock:{key}", 1, nx=True, px=self.lock_ms))
+
+    def release(self, key):
+        self.client.delete(f"{self.prefix}lock:{key}")
+
+
+class _Flight:
+    __slots__ = ("event", "result")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    # Concurrent callers for the same key share one call of fn(); followers
+    # get the leader's result.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            return flight.result, False
+        try:
+            flight.result = fn()
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+        return flight.result, True
+
+
+class ResponseCache:
+    # Entries are keyed by route, normalized query args and the versions of
+    # the resources the route reads. A write that bumps one of those versions
+    # therefore makes every dependent entry unreachable; old entries simply
+    # age out.
+    def __init__(self, backend, wait_timeout=2.0):
+        self.backend = backend
+        self.wait_timeout = wait_timeout
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, resources):
+        return cache_key(
+            request.url_rule.rule if request.url_rule is not None else request.path,
+            request.view_args or {},
+            request.args.items(multi=True),
+            {name: version_info(name)[0] for name in resources}
+        )
+
+    def fetch(self, key, compute):
+        # Returns (body, response): body is the cached payload, or None when
+        # the caller has to use the freshly computed response instead.
+        body = self.backend.get(key)
+        if body is not None:
+            self.hits += 1
+            return body, None
+
+        def load():
+            acquired = self.backend.acquire(key)
+            if not acquired:
+                body = self._wait_for(key)
+                if body is not None:
+                    return body, None
+            try:
+                response = compute()
+                if response.status_code != 200:
+                    return None, response
+                body = encode_entry(response.mimetype, response.get_data())
+                self.backend.set(key, body)
+                return body, response
+            finally:
+                if acquired:
+                    self.backend.release(key)
+
+        result, leader = self._flights.do(key, load)
+        if leader:
+            self.misses += 1
+            return result
+        if result is None or result[0] is None:
+            # The leader failed or produced an uncacheable response.
+            return None, compute()
+        self.hits += 1
+        return result[0], None
+
+    def _wait_for(self, key):
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            body = self.backend.get(key)
+            if body is not None:
+                return body
+        return None
+
+
+def cached_response(*resources):
+    # Read-through cache for GET views whose body depends only on the URL and
+    # the named resource versions (see versions.bump_version). A resource may
+    # also be a callable that takes the view's arguments and returns names.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get("response_cache")
+            if cache is None or request.method != "GET":
+                return view(*args, **kwargs)
+
+            def compute():
+                return current_app.make_response(view(*args, **kwargs))
+
+            names = []
+            for resource in resources:
+                names.extend(resource(**kwargs) if callable(resource) else [resource])
+            body, response = cache.fetch(cache.key(names), compute)
+            if response is not None:
+                return response
+            mimetype, data = decode_entry(body)
+            return current_app.response_class(data, mimetype=mimetype)
+        return wrapper
+    return decorator
+
+
+def init_response_cache(app):
+    backend = app.config["RESPONSE_CACHE"]
+    if backend == "none":
+        return None
+    if backend == "redis":
+        import redis
+        store = RedisResponseCache(
+            redis.Redis.from_url(app.config["REDIS_URL"]),
+            prefix=app.config["RESPONSE_CACHE_PREFIX"],
+            ttl=app.config["RESPONSE_CACHE_TTL"]
+        )
+    elif backend == "local":
+        store = LocalResponseCache(
+            maxsize=app.config["RESPONSE_CACHE_SIZE"],
+            ttl=app.config["RESPONSE_CACHE_TTL"]
+        )
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE: {backend}")
+    cache = ResponseCache(store)
+    app.extensions["response_cache"] = cache
+    return cache
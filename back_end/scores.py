@@ -0,0 +1,64 @@
+from sqlalchemy import case, func, or_
+from . import db
+from .models import GameScore
+from .stats import dialect_insert
+
+
+def _merge_statement(user_id, scores, dialect_name=None):
+    # One INSERT ... ON CONFLICT DO UPDATE for (game_type, level, score,
+    # completed) rows with distinct keys. The SET expressions read the
+    # conflicting row under its row lock, so concurrent submissions for the
+    # same key each see the best score left by the one before them.
+    stmt = dialect_insert(GameScore, dialect_name).values([
+        {
+            "user_id": user_id,
+            "game_type": game_type,
+            "level": level,
+            "best_score": score,
+            "completed": bool(completed),
+            "last_points_added": score,
+            "updated_date": func.now()
+        }
+        for game_type, level, score, completed in scores
+    ])
+    previous_best = func.coalesce(GameScore.best_score, 0)
+    is_new_best = stmt.excluded.best_score > previous_best
+    return stmt.on_conflict_do_update(
+        index_elements=[GameScore.user_id, GameScore.game_type, GameScore.level],
+        set_={
+            "best_score": case((is_new_best, stmt.excluded.best_score), else_=previous_best),
+            "last_points_added": case((is_new_best, stmt.excluded.best_score - previous_best), else_=0),
+            "completed": or_(GameScore.completed.is_(True), stmt.excluded.completed.is_(True)),
+            "updated_date": func.now()
+        }
+    )
+
+
+def merge_game_score_statement(user_id, game_type, level, score, completed, dialect_name=None):
+    return _merge_statement(
+        user_id, [(game_type, level, score, completed)], dialect_name
+    ).returning(GameScore.best_score, GameScore.last_points_added)
+
+
+def merge_game_scores_statement(user_id, scores, dialect_name=None):
+    # Rows are locked in VALUES order, so the scores are sorted by key to
+    # keep concurrent sessions of the same user from deadlocking.
+    return _merge_statement(user_id, sorted(scores), dialect_name).returning(
+        GameScore.game_type, GameScore.level, GameScore.best_score, GameScore.last_points_added
+    )
+
+
+def merge_game_score(user_id, game_type, level, score, completed):
+    best_score, points_to_add = db.session.execute(
+        merge_game_score_statement(user_id, game_type, level, score, completed)
+    ).one()
+    return best_score, points_to_add
+
+
+def merge_game_scores(user_id, scores):
+    # {(game_type, level): (best_score, points_added)} for scores whose keys
+    # are distinct, in one round trip.
+    if not scores:
+        return {}
+    rows = db.session.execute(merge_game_scores_statement(user_id, scores)).all()
+    return {(game_type, level): (best_score, points_added) for game_type, level, best_score, points_added in rows}
@@ -0,0 +1,177 @@
+import secrets
+import threading
+import time
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, refreshed_at=0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.refreshed_at = refreshed_at
+        # The user the stored session belonged to, and the sid it was stored
+        # under before regenerate().
+        self.loaded_user_id = self.get("_user_id")
+        self.previous_sid = None
+
+    def regenerate(self):
+        # Moves the session to a fresh sid. save_session deletes the old
+        # entry, so a sid known to someone else stops working.
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+    @property
+    def permanent(self):
+        return self.get("_permanent", False)
+
+    @permanent.setter
+    def permanent(self, value):
+        # Handlers set this on every request; only a real change should
+        # count as a modification and trigger a write.
+        if self.get("_permanent", False) != bool(value):
+            self["_permanent"] = bool(value)
+
+
+class MemorySessionStore:
+    # In-process stand-in for Redis, for tests and single-process dev servers.
+    blocking = False
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[sid]
+                return None
+            return entry[1]
+
+    def set(self, sid, payload, ttl):
+        with self._lock:
+            self._data[sid] = (time.time() + ttl, payload)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class RedisSessionStore:
+    blocking = True
+
+    def __init__(self, client, prefix="session:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid):
+        return self.client.get(self.prefix + sid)
+
+    def set(self, sid, payload, ttl):
+        self.client.set(self.prefix + sid, payload, ex=ttl)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    # Only an opaque signed session id travels in the cookie. The payload is
+    # compact tagged JSON in the store. An unmodified session is rewritten
+    # (and its cookie re-issued) at most once per refresh_interval, instead
+    # of on every request.
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, refresh_interval=3600):
+        self.store = store
+        self.refresh_interval = refresh_interval
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="server-side-session")
+
+    def _ttl(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                payload = self.store.get(sid)
+                if payload is not None:
+                    try:
+                        stored = self.serializer.loads(payload)
+                        return ServerSideSession(stored["d"], sid=sid, refreshed_at=stored["r"])
+                    except (ValueError, KeyError, TypeError):
+                        pass
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # Logging in, signing up or logging out never keeps the sid the
+        # client arrived with (session fixation).
+        if session.get("_user_id") != session.loaded_user_id:
+            session.regenerate()
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = int(time.time())
+        if not session.modified and now - session.refreshed_at < self.refresh_interval:
+            return
+
+        response.vary.add("Cookie")
+        payload = self.serializer.dumps({"r": now, "d": dict(session)})
+        self.store.set(session.sid, payload, self._ttl(app))
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+
+def init_session_backend(app):
+    backend = app.config["SESSION_BACKEND"]
+    if backend == "cookie":
+        return
+    if backend == "redis":
+        import redis
+        store = RedisSessionStore(
+            redis.Redis.from_url(app.config["REDIS_URL"]),
+            prefix=app.config["SESSION_KEY_PREFIX"]
+        )
+    elif backend == "memory":
+        store = MemorySessionStore()
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    app.session_interface = ServerSideSessionInterface(
+        store,
+        refresh_interval=app.config["SESSION_REFRESH_INTERVAL"]
+    )
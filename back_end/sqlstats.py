@@ -0,0 +1,92 @@
+import functools
+import time
+from flask import g, has_request_context, jsonify
+from sqlalchemy import event
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements", "allow_repeats")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+        self.allow_repeats = False
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    stats = g.get("_query_stats")
+    if stats is None:
+        stats = g._query_stats = QueryStats()
+    return stats
+
+
+def allows_repeated_queries(view):
+    # For handlers that deliberately run one statement per item of a bounded
+    # batch, so strict mode doesn't flag them.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        stats = _request_stats()
+        if stats is not None:
+            stats.allow_repeats = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_query_stats(app):
+    from . import db
+
+    totals = {"queries": 0, "seconds": 0.0}
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        totals["queries"] += 1
+        totals["seconds"] += elapsed
+        stats = _request_stats()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    @app.after_request
+    def report_queries(response):
+        stats = g.get("_query_stats")
+        if stats is None:
+            return response
+
+        repeat_limit = app.config["SQL_STRICT_REPEAT_LIMIT"]
+        if repeat_limit and not stats.allow_repeats:
+            repeated = {
+                statement: count for statement, count in stats.statements.items()
+                if count > repeat_limit
+            }
+            if repeated:
+                statement, count = max(repeated.items(), key=lambda item: item[1])
+                response = jsonify({
+                    "status": 500,
+                    "message": f"Statement executed {count} times in one request (limit {repeat_limit}); likely an N+1 query",
+                    "statement": " ".join(statement.split())
+                })
+                response.status_code = 500
+
+        if app.debug or app.config["SQL_QUERY_HEADERS"]:
+            response.headers["X-DB-Queries"] = str(stats.count)
+            response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000.0:.2f}"
+        return response
+
+    metrics = app.extensions.get("metrics")
+    if metrics is not None:
+        metrics.register_collector(lambda: {
+            "db_queries": totals["queries"],
+            "db_query_seconds": round(totals["seconds"], 6)
+        }, kind="counter")
@@ -0,0 +1,174 @@
+import click
+from sqlalchemy import case, func, select, union_all, update
+from . import db
+from .models import Feedback, FeedbackStats, Point, PointRollup, UserStats
+from .pool import disable_statement_timeout
+from .versions import FEEDBACKS, LEADERBOARD, bump_version
+
+
+def dialect_insert(model, dialect_name=None):
+    # PostgreSQL and SQLite both support INSERT ... ON CONFLICT, but through
+    # their own dialect-specific insert() constructs. The async engine passes
+    # its dialect name, since db.engine needs an app context.
+    if (dialect_name or db.engine.dialect.name) == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+def record_points_statement(user_id, points, total=None, dialect_name=None):
+    # Returns the player's best_points after the upsert.
+    stmt = dialect_insert(UserStats, dialect_name).values(
+        user_id=user_id,
+        best_points=points,
+        total_points=points if total is None else total,
+        updated_date=func.now()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            "best_points": case(
+                (stmt.excluded.best_points > UserStats.best_points, stmt.excluded.best_points),
+                else_=UserStats.best_points
+            ),
+            "total_points": UserStats.total_points + stmt.excluded.total_points,
+            "updated_date": func.now()
+        }
+    ).returning(UserStats.best_points)
+    return stmt
+
+
+def record_points(user_id, points, total=None):
+    # Runs inside the caller's transaction; the caller commits. A batch of
+    # point rows is recorded once with its best value and its sum as total.
+    record_user_points({user_id: (points, points if total is None else total)})
+
+
+def record_user_points(per_user):
+    # per_user maps user_id to (best, total). Rows are upserted in user_id
+    # order and the leaderboard version is bumped once, last, so concurrent
+    # transactions always lock user_stats rows and then that shared row in
+    # the same order. The bump only happens when a player could have moved
+    # on the board, so ordinary saves don't contend on it.
+    moved = False
+    for user_id, (best, total) in sorted(per_user.items()):
+        best_points = db.session.execute(record_points_statement(user_id, best, total)).scalar()
+        moved = moved or best_points == best
+    if moved:
+        bump_version(LEADERBOARD)
+
+
+def touch_user_stats_statement(user_id):
+    # Only players with a stats row appear on the leaderboard, so this never
+    # creates one.
+    return update(UserStats).where(
+        UserStats.user_id == user_id
+    ).values(updated_date=func.now())
+
+
+def touch_user_stats(user_id):
+    db.session.execute(touch_user_stats_statement(user_id))
+
+
+def backfill_user_stats():
+    # Raw point rows older than the retention window only survive as daily
+    # rollups, so both sources feed the rebuilt stats.
+    history = union_all(
+        select(
+            Point.user_id.label("user_id"),
+            Point.points.label("best"),
+            Point.points.label("total"),
+            Point.point_date.label("updated")
+        ),
+        select(
+            PointRollup.user_id,
+            PointRollup.max_points,
+            PointRollup.sum_points,
+            PointRollup.day
+        )
+    ).subquery()
+    aggregates = select(
+        history.c.user_id,
+        func.coalesce(func.max(history.c.best), 0),
+        func.coalesce(func.sum(history.c.total), 0),
+        func.max(history.c.updated)
+    ).where(
+        history.c.user_id.isnot(None)
+    ).group_by(history.c.user_id)
+
+    disable_statement_timeout(db.session.connection())
+    db.session.query(UserStats).delete()
+    db.session.execute(
+        UserStats.__table__.insert().from_select(
+            ["user_id", "best_points", "total_points", "updated_date"],
+            aggregates
+        )
+    )
+    bump_version(LEADERBOARD)
+    db.session.commit()
+    return db.session.query(func.count(UserStats.user_id)).scalar()
+
+
+def record_feedback(game_type, stars):
+    # Runs inside the caller's transaction, next to the feedback insert.
+    star_column = f"stars_{stars}"
+    stmt = dialect_insert(FeedbackStats).values(
+        game_type=game_type or "",
+        count=1,
+        stars_total=stars,
+        updated_date=func.now(),
+        **{f"stars_{value}": int(value == stars) for value in range(1, 6)}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FeedbackStats.game_type],
+        set_={
+            "count": FeedbackStats.count + 1,
+            "stars_total": FeedbackStats.stars_total + stars,
+            star_column: getattr(FeedbackStats, star_column) + 1,
+            "updated_date": func.now()
+        }
+    )
+    db.session.execute(stmt)
+
+
+def backfill_feedback_stats():
+    star_counts = [
+        func.coalesce(func.sum(case((Feedback.stars == value, 1), else_=0)), 0)
+        for value in range(1, 6)
+    ]
+    aggregates = select(
+        func.coalesce(Feedback.game_type, ""),
+        func.count(Feedback.id),
+        func.coalesce(func.sum(Feedback.stars), 0),
+        *star_counts,
+        func.now()
+    ).where(
+        Feedback.stars.between(1, 5)
+    ).group_by(Feedback.game_type)
+
+    disable_statement_timeout(db.session.connection())
+    db.session.query(FeedbackStats).delete()
+    db.session.execute(
+        FeedbackStats.__table__.insert().from_select(
+            ["game_type", "count", "stars_total", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5", "updated_date"],
+            aggregates
+        )
+    )
+    bump_version(FEEDBACKS)
+    db.session.commit()
+    return db.session.query(func.count(FeedbackStats.game_type)).scalar()
+
+
+@click.command("backfill-user-stats")
+def backfill_user_stats_command():
+    """Rebuild the user_stats table from point rows and daily rollups."""
+    count = backfill_user_stats()
+    click.echo(f"Backfilled stats for {count} users")
+
+
+@click.command("backfill-feedback-stats")
+def backfill_feedback_stats_command():
+    """Rebuild the feedback_stats counters from feedback rows."""
+    count = backfill_feedback_stats()
+    click.echo(f"Backfilled feedback stats for {count} game types")
@@ -0,0 +1,158 @@
+import functools
+import threading
+import time
+from datetime import timezone
+from flask import current_app, make_response, request
+from sqlalchemy import event, func, select
+from . import db
+from .models import ResourceVersion
+
+DEDICATED_MEMBERS = "dedicated_members"
+FEEDBACKS = "feedbacks"
+LEADERBOARD = "leaderboard"
+GAME_BOARD = "game_board"
+# Per-game boards get a version each, so lookups are kept in a bounded
+# cache rather than one entry per name ever requested.
+VERSION_CACHE_SIZE = 1024
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def game_board(game_type, level=None):
+    # Version of one game's board for a level, or of its overall board
+    # (scores summed over levels) when level is None.
+    if level is None:
+        return f"{GAME_BOARD}:{game_type}"
+    return f"{GAME_BOARD}:{game_type}:{level}"
+
+
+def bump_versions_statement(names, dialect_name=None):
+    # One multi-row upsert for all the names. Rows are locked in VALUES
+    # order, so callers pass the names sorted.
+    from .stats import dialect_insert
+
+    stmt = dialect_insert(ResourceVersion, dialect_name).values([
+        {"name": name, "version": 1, "updated_date": func.now()} for name in names
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[ResourceVersion.name],
+        set_={
+            "version": ResourceVersion.version + 1,
+            "updated_date": func.now()
+        }
+    )
+
+
+def bump_version_statement(name, dialect_name=None):
+    return bump_versions_statement([name], dialect_name)
+
+
+def bump_versions(names):
+    # Runs inside the caller's transaction, so the new versions only become
+    # visible together with the change they describe. This process drops its
+    # cached copies once the transaction commits.
+    names = sorted(set(names))
+    if not names:
+        return
+    db.session.execute(bump_versions_statement(names))
+    db.session.info.setdefault("bumped_versions", set()).update(names)
+
+
+def bump_version(name):
+    bump_versions([name])
+
+
+def forget_versions(names):
+    with _cache_lock:
+        for name in names:
+            _cache.pop(name, None)
+
+
+@event.listens_for(db.session, "after_commit")
+def _forget_committed_versions(session):
+    bumped = session.info.pop("bumped_versions", None)
+    if bumped:
+        forget_versions(bumped)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_bumped_versions(session, previous_transaction):
+    session.info.pop("bumped_versions", None)
+
+
+def version_statement(name):
+    return select(ResourceVersion.version, ResourceVersion.updated_date).where(ResourceVersion.name == name)
+
+
+def cached_version(name, ttl):
+    # Lookups are shared for RESOURCE_VERSION_TTL seconds, which bounds how
+    # long a change made by another worker can go unnoticed here.
+    cached = _cache.get(name)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1], cached[2]
+    return None
+
+
+def remember_version(name, row):
+    version, updated = row if row is not None else (0, None)
+    if updated is not None and updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    with _cache_lock:
+        _cache.pop(name, None)
+        _cache[name] = (time.monotonic(), version, updated)
+        while len(_cache) > VERSION_CACHE_SIZE:
+            del _cache[next(iter(_cache))]
+    return version, updated
+
+
+def version_info(name):
+    # Returns (version, last_modified).
+    cached = cached_version(name, current_app.config["RESOURCE_VERSION_TTL"])
+    if cached is not None:
+        return cached
+    return remember_version(name, db.session.execute(version_statement(name)).first())
+
+
+def current_version(name):
+    return version_info(name)[0]
+
+
+def is_not_modified(etag, updated, if_none_match, if_modified_since):
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if if_modified_since and updated is not None:
+        return updated.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def add_validators(response, etag, updated):
+    response.set_etag(etag, weak=True)
+    if updated is not None:
+        response.last_modified = updated
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(name):
+    # ETag / Last-Modified validation for GET endpoints whose body only
+    # changes when the named version is bumped. An unchanged poll is answered
+    # with a 304 before the view runs.
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return view(*args, **kwargs)
+
+            version, updated = version_info(name)
+            etag = f"{name}-{version}"
+
+            if is_not_modified(etag, updated, request.if_none_match, request.if_modified_since):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            return add_validators(response, etag, updated)
+        return wrapper
+    return decorator
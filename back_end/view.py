@@ -1,17 +1,118 @@
-from flask import Blueprint, render_template, request, flash, jsonify,send_file
+from flask import Blueprint, render_template, request, flash, jsonify, send_file, session, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import desc, exists, insert, literal, select, tuple_
+from sqlalchemy.sql import func
+from datetime import datetime, timezone
+from . import db
+from .ingest import BufferFull
+from .leaderboards import bump_game_boards
+from .logs import log_event
+from .models import Feedback, FeedbackStats, GameScore, Note, Point, User, UserCompletion
+from .scores import merge_game_score, merge_game_scores
+from .stats import record_feedback, record_points, touch_user_stats
+from .responsecache import cached_response
+from .versions import DEDICATED_MEMBERS, FEEDBACKS, bump_version, conditional
 
 import json
+import logging
 import os
 
 view = Blueprint("views", __name__)
+logger = logging.getLogger(__name__)
+
+def _parse_points(data):
+    points = data.get("points")
+    if points is None:
+        return None, {"status": 406, "message": "Points value is required"}
+    try:
+        return int(points), None
+    except (ValueError, TypeError):
+        return None, {"status": 406, "message": "Points must be a number"}
+
+def _parse_game_score(data):
+    game_type = data.get("gameType")
+    level = data.get("level")
+    score = data.get("score")
+    completed = data.get("completed", False)
+    
+    if not game_type or level is None or score is None:
+        return None, {"status": 406, "message": "gameType, level, and score are required"}
+    try:
+        return (game_type, int(level), int(score), completed), None
+    except (ValueError, TypeError):
+        return None, {"status": 406, "message": "level and score must be numbers"}
+
+def _game_score_result(best_score, points_to_add):
+    return {
+        "status": 200,
+        "message": "Game score saved successfully",
+        "bestScore": best_score,
+        "pointsToAdd": points_to_add,
+        "wasNewRecord": points_to_add > 0
+    }
+
+def _points_pending_result(points):
+    # The write-behind buffer still holds the event and will commit it; a
+    # client retry would save the points twice.
+    return {
+        "status": 202,
+        "message": "Points accepted and will be saved shortly; do not resend.",
+        "points": points,
+        "pending": True
+    }
+
+def _completion_data(user_completion):
+    return {
+        "soccer": user_completion.soccer_completed,
+        "rocket": user_completion.rocket_completed,
+        "asteroid": user_completion.asteroid_completed,
+        "quiz": user_completion.quiz_completed,
+        "quizScore": user_completion.quiz_score,
+        "allCompleted": user_completion.all_completed
+    }
+
+def _apply_completion(user_completion, game_type, quiz_score):
+    if game_type == "soccer":
+        user_completion.soccer_completed = True
+    elif game_type == "rocket":
+        user_completion.rocket_completed = True
+    elif game_type == "asteroid":
+        user_completion.asteroid_completed = True
+    elif game_type == "quiz":
+        if quiz_score is not None:
+            quiz_score_float = float(quiz_score)
+            if quiz_score_float >= 80.0:
+                user_completion.quiz_completed = True
+                user_completion.quiz_score = quiz_score_float
+            else:
+                return {
+                    "status": 200,
+                    "message": "Quiz score saved but not completed (need 80% or perfect)",
+                    "quizScore": quiz_score_float,
+                    "quizCompleted": False
+                }
+    
+    if (user_completion.soccer_completed and 
+        user_completion.rocket_completed and 
+        user_completion.asteroid_completed and 
+        user_completion.quiz_completed):
+        if not user_completion.all_completed:
+            user_completion.all_completed = True
+            # Set from Python rather than func.now() so the value can round-trip
+            # through a pagination cursor and compare equal to the stored one.
+            user_completion.completed_date = datetime.now(timezone.utc)
+            bump_version(DEDICATED_MEMBERS)
+    
+    user_completion.updated_date = func.now()
+    return {
+        "status": 200,
+        "message": "Completion status saved successfully!",
+        "completion": _completion_data(user_completion)
+    }
 
 @view.route("/", methods=["GET", "POST"])
 @login_required
 def home():
-    from .models import Note, User
-    from . import db
-
     if request.method == "POST":
         note = request.form.get("note") or ""
 
@@ -40,9 +141,6 @@ def delete_note():
     if not note_id:
         return {"error": "missing note id"}, 400
 
-    from .models import Note
-    from . import db
-
     note = Note.query.get(note_id)
     if not note:
         return {"error": "note not found"}, 404
@@ -54,114 +152,69 @@ def delete_note():
     db.session.commit()
     return jsonify({})
 
-@view.route("/save-points", methods=["POST", "OPTIONS"])
+@view.route("/save-points", methods=["POST"])
 def save_points():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user, login_required
-    from .models import Point
-    from . import db
-    from flask import session
-    
-    print(f"save-points endpoint called")
-    print(f"Request cookies: {dict(request.cookies)}")
-    print(f"Session keys: {list(session.keys())}")
-    print(f"Session ID: {session.get('_id', 'N/A')}")
-    print(f"Current user authenticated: {current_user.is_authenticated}")
-    print(f"Current user: {current_user.username if current_user.is_authenticated else 'None'}")
-    print(f"Request headers Origin: {request.headers.get('Origin', 'N/A')}")
-    
     if not current_user.is_authenticated:
-        print("User not authenticated, returning 401")
+        log_event(logger, "points.unauthenticated", level=logging.DEBUG, origin=request.headers.get("Origin"))
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
-        
-        print(f"User {current_user.username} is authenticated")
-        
         data = request.json if request.is_json else request.form
-        points = data.get("points")
-        
-        print(f"Received points: {points}")
-        
-        if points is None:
-            response = jsonify({
-                "status": 406,
-                "message": "Points value is required"
-            })
-            return response, 406
-        
-        try:
-            points = int(points)
-        except (ValueError, TypeError):
-            response = jsonify({
-                "status": 406,
-                "message": "Points must be a number"
-            })
-            return response, 406
-        
-        new_point = Point(points=points, user_id=current_user.id)
-        db.session.add(new_point)
-        db.session.commit()
+        points, error = _parse_points(data)
+        
+        if error:
+            return jsonify(error), 406
+        
+        points_buffer = current_app.extensions.get("points_buffer")
+        if points_buffer:
+            try:
+                ticket = points_buffer.submit(current_user.id, points)
+            except BufferFull:
+                response = jsonify({
+                    "status": 503,
+                    "message": "Server is busy, please retry shortly."
+                })
+                response.headers["Retry-After"] = "1"
+                return response, 503
+            if ticket:
+                try:
+                    ticket.wait(timeout=10)
+                except TimeoutError:
+                    log_event(logger, "points.pending", level=logging.WARNING, user_id=current_user.id, points=points)
+                    return jsonify(_points_pending_result(points)), 202
+        else:
+            new_point = Point(points=points, user_id=current_user.id)
+            db.session.add(new_point)
+            record_points(current_user.id, points)
+            db.session.commit()
         
-        print(f"Points saved successfully: {points} for user {current_user.username}")
+        log_event(logger, "points.saved", user_id=current_user.id, points=points)
         
         response = jsonify({
             "status": 200,
             "message": "Points saved successfully!",
             "points": points
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in save_points: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_points")
         response = jsonify({
             "status": 500,
             "message": f"Error saving points: {str(e)}"
         })
         return response, 500
 
-@view.route("/save-completion", methods=["POST", "OPTIONS"])
+@view.route("/save-completion", methods=["POST"])
 def save_completion():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import UserCompletion
-    from . import db
-    from sqlalchemy.sql import func
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -174,98 +227,35 @@ def save_completion():
                 "status": 406,
                 "message": "gameType is required"
             })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 406
         
         user_completion = UserCompletion.query.filter_by(user_id=current_user.id).first()
         if not user_completion:
             user_completion = UserCompletion(user_id=current_user.id)
             db.session.add(user_completion)
+            db.session.flush()
         
-        if game_type == "soccer":
-            user_completion.soccer_completed = True
-        elif game_type == "rocket":
-            user_completion.rocket_completed = True
-        elif game_type == "asteroid":
-            user_completion.asteroid_completed = True
-        elif game_type == "quiz":
-            if quiz_score is not None:
-                quiz_score_float = float(quiz_score)
-                if quiz_score_float >= 80.0:
-                    user_completion.quiz_completed = True
-                    user_completion.quiz_score = quiz_score_float
-                else:
-                    response = jsonify({
-                        "status": 200,
-                        "message": "Quiz score saved but not completed (need 80% or perfect)",
-                        "quizScore": quiz_score_float,
-                        "quizCompleted": False
-                    })
-                    response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-                    response.headers.add("Access-Control-Allow-Credentials", "true")
-                    return response
-        
-        if (user_completion.soccer_completed and 
-            user_completion.rocket_completed and 
-            user_completion.asteroid_completed and 
-            user_completion.quiz_completed):
-            if not user_completion.all_completed:
-                user_completion.all_completed = True
-                user_completion.completed_date = func.now()
-        
-        user_completion.updated_date = func.now()
-        db.session.commit()
+        result = _apply_completion(user_completion, game_type, quiz_score)
+        if "completion" in result:
+            db.session.commit()
         
-        response = jsonify({
-            "status": 200,
-            "message": "Completion status saved successfully!",
-            "completion": {
-                "soccer": user_completion.soccer_completed,
-                "rocket": user_completion.rocket_completed,
-                "asteroid": user_completion.asteroid_completed,
-                "quiz": user_completion.quiz_completed,
-                "quizScore": user_completion.quiz_score,
-                "allCompleted": user_completion.all_completed
-            }
-        })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
+        response = jsonify(result)
         return response
     except Exception as e:
-        print(f"Error in save_completion: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_completion")
         response = jsonify({
             "status": 500,
             "message": f"Error saving completion: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/get-completion", methods=["GET", "OPTIONS"])
+@view.route("/get-completion", methods=["GET"])
 def get_completion():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import UserCompletion
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -281,56 +271,28 @@ def get_completion():
                 "allCompleted": False
             }
         else:
-            completion_data = {
-                "soccer": user_completion.soccer_completed,
-                "rocket": user_completion.rocket_completed,
-                "asteroid": user_completion.asteroid_completed,
-                "quiz": user_completion.quiz_completed,
-                "quizScore": user_completion.quiz_score,
-                "allCompleted": user_completion.all_completed
-            }
+            completion_data = _completion_data(user_completion)
         
         response = jsonify({
             "status": 200,
             "completion": completion_data
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in get_completion: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_completion")
         response = jsonify({
             "status": 500,
             "message": f"Error getting completion: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/get-game-score", methods=["GET", "OPTIONS"])
+@view.route("/get-game-score", methods=["GET"])
 def get_game_score():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import GameScore
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -342,8 +304,6 @@ def get_game_score():
                 "status": 406,
                 "message": "gameType and level are required"
             })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 406
         
         game_score = GameScore.query.filter_by(
@@ -367,190 +327,248 @@ def get_game_score():
             "status": 200,
             "score": score_data
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in get_game_score: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_game_score")
         response = jsonify({
             "status": 500,
             "message": f"Error getting game score: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/save-game-score", methods=["POST", "OPTIONS"])
+@view.route("/save-game-score", methods=["POST"])
 def save_game_score():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import GameScore
-    from . import db
-    from sqlalchemy.sql import func
-    from sqlalchemy.exc import IntegrityError
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
         data = request.json if request.is_json else request.form
-        game_type = data.get("gameType")
-        level = data.get("level")
-        score = data.get("score")
-        completed = data.get("completed", False)
+        parsed, error = _parse_game_score(data)
         
-        if not game_type or level is None or score is None:
-            response = jsonify({
-                "status": 406,
-                "message": "gameType, level, and score are required"
-            })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
+        if error:
+            response = jsonify(error)
             return response, 406
         
-        try:
-            level = int(level)
-            score = int(score)
-        except (ValueError, TypeError):
+        game_type, level, score, completed = parsed
+        best_score, points_to_add = merge_game_score(
+            current_user.id,
+            game_type,
+            level,
+            score,
+            completed
+        )
+        if points_to_add > 0:
+            bump_game_boards([(game_type, level)])
+        touch_user_stats(current_user.id)
+        db.session.commit()
+        
+        response = jsonify(_game_score_result(best_score, points_to_add))
+        return response
+    except Exception as e:
+        logger.exception("Error in save_game_score")
+        response = jsonify({
+            "status": 500,
+            "message": f"Error saving game score: {str(e)}"
+        })
+        return response, 500
+
+@view.route("/save-session", methods=["POST"])
+def save_session():
+    if not current_user.is_authenticated:
+        response = jsonify({
+            "status": 401,
+            "message": "Authentication required. Please login again."
+        })
+        return response, 401
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        game_score_items = data.get("gameScores") or []
+        points_items = data.get("points") or []
+        completion_items = data.get("completions") or []
+        
+        if not all(isinstance(items, list) for items in (game_score_items, points_items, completion_items)):
             response = jsonify({
                 "status": 406,
-                "message": "level and score must be numbers"
+                "message": "gameScores, points and completions must be arrays"
             })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 406
         
-        game_score = GameScore.query.filter_by(
-            user_id=current_user.id,
-            game_type=game_type,
-            level=level
-        ).first()
+        invalid_item = {"status": 406, "message": "Invalid item"}
+        
+        game_score_results = []
+        parsed_scores = []
+        merged_scores = {}
+        for item in game_score_items:
+            if not isinstance(item, dict):
+                game_score_results.append(invalid_item)
+                continue
+            parsed, error = _parse_game_score(item)
+            if error:
+                game_score_results.append(error)
+                continue
+            game_type, level, score, completed = parsed
+            key = (game_type, level)
+            best, was_completed = merged_scores.get(key, (score, False))
+            merged_scores[key] = (max(best, score), was_completed or bool(completed))
+            parsed_scores.append((len(game_score_results), key, score))
+            game_score_results.append(None)
+        # Items for the same game and level are merged into one row of a
+        # single upsert; each item's result is then replayed from the best
+        # score the row held before this session, as if they had been saved
+        # one after the other.
+        merged = merge_game_scores(current_user.id, [
+            (game_type, level, score, completed)
+            for (game_type, level), (score, completed) in merged_scores.items()
+        ])
+        running_best = {key: best_score - points_added for key, (best_score, points_added) in merged.items()}
+        for index, key, score in parsed_scores:
+            points_to_add = max(score - running_best[key], 0)
+            running_best[key] = max(running_best[key], score)
+            game_score_results[index] = _game_score_result(running_best[key], points_to_add)
+        bump_game_boards([key for key, (_, points_added) in merged.items() if points_added > 0])
+        
+        points_results = []
+        point_values = []
+        for item in points_items:
+            points, error = _parse_points(item if isinstance(item, dict) else {"points": item})
+            if error:
+                points_results.append(error)
+                continue
+            point_values.append(points)
+            points_results.append({
+                "status": 200,
+                "message": "Points saved successfully!",
+                "points": points
+            })
+        if point_values:
+            db.session.execute(insert(Point), [
+                {"points": points, "user_id": current_user.id} for points in point_values
+            ])
+            record_points(current_user.id, max(point_values), total=sum(point_values))
+        elif game_score_results:
+            touch_user_stats(current_user.id)
+        
+        completion_results = []
+        user_completion = None
+        for item in completion_items:
+            if not isinstance(item, dict):
+                completion_results.append(invalid_item)
+                continue
+            game_type = item.get("gameType")
+            if not game_type:
+                completion_results.append({"status": 406, "message": "gameType is required"})
+                continue
+            if user_completion is None:
+                user_completion = UserCompletion.query.filter_by(user_id=current_user.id).first()
+                if not user_completion:
+                    user_completion = UserCompletion(user_id=current_user.id)
+                    db.session.add(user_completion)
+                    db.session.flush()
+            completion_results.append(_apply_completion(user_completion, game_type, item.get("quizScore")))
         
-        if not game_score:
-            game_score = GameScore(
-                user_id=current_user.id,
-                game_type=game_type,
-                level=level,
-                best_score=score,
-                completed=completed
-            )
-            db.session.add(game_score)
-            points_to_add = score
+        db.session.commit()
+        
+        response = jsonify({
+            "status": 200,
+            "message": "Session saved successfully",
+            "gameScores": game_score_results,
+            "points": points_results,
+            "completions": completion_results
+        })
+        return response
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error in save_session")
+        response = jsonify({
+            "status": 500,
+            "message": f"Error saving session: {str(e)}"
+        })
+        return response, 500
+
+@view.route("/bootstrap", methods=["GET"])
+def bootstrap():
+    if not current_user.is_authenticated:
+        response = jsonify({
+            "status": 401,
+            "authenticated": False,
+            "message": "Not authenticated"
+        })
+        return response, 401
+    
+    if not session.permanent:
+        session.permanent = True
+    
+    try:
+        # One round trip: a single anchor row, outer-joined to the user's
+        # completion row and game scores, with the feedback check inlined.
+        has_feedback = exists().where(
+            Feedback.user_id == current_user.id,
+            Feedback.game_type.is_(None)
+        )
+        anchor = select(literal(1).label("anchor")).subquery()
+        rows = db.session.execute(
+            select(
+                has_feedback.label("has_feedback"),
+                UserCompletion,
+                GameScore
+            ).select_from(anchor).outerjoin(
+                UserCompletion, UserCompletion.user_id == current_user.id
+            ).outerjoin(
+                GameScore, GameScore.user_id == current_user.id
+            ).order_by(GameScore.game_type, GameScore.level)
+        ).all()
+        
+        user_completion = rows[0][1]
+        if not user_completion:
+            completion_data = {
+                "soccer": False,
+                "rocket": False,
+                "asteroid": False,
+                "quiz": False,
+                "quizScore": 0.0,
+                "allCompleted": False
+            }
         else:
-            was_already_completed = game_score.completed
-            
-            if was_already_completed:
-                if score > game_score.best_score:
-                    points_to_add = score - game_score.best_score
-                    game_score.best_score = score
-                else:
-                    points_to_add = 0
-            else:
-                if score > game_score.best_score:
-                    points_to_add = score - game_score.best_score
-                    game_score.best_score = score
-                else:
-                    points_to_add = 0
-            
-            if completed:
-                game_score.completed = True
-            
-            game_score.updated_date = func.now()
+            completion_data = _completion_data(user_completion)
         
-        try:
-            db.session.commit()
-        except IntegrityError:
-            db.session.rollback()
-            game_score = GameScore.query.filter_by(
-                user_id=current_user.id,
-                game_type=game_type,
-                level=level
-            ).first()
-            
-            if game_score:
-                was_already_completed = game_score.completed
-                
-                if was_already_completed:
-                    if score > game_score.best_score:
-                        points_to_add = score - game_score.best_score
-                        game_score.best_score = score
-                    else:
-                        points_to_add = 0
-                else:
-                    if score > game_score.best_score:
-                        points_to_add = score - game_score.best_score
-                        game_score.best_score = score
-                    else:
-                        points_to_add = 0
-                
-                if completed:
-                    game_score.completed = True
-                
-                game_score.updated_date = func.now()
-                db.session.commit()
-            else:
-                raise
+        game_scores = [{
+            "gameType": game_score.game_type,
+            "level": game_score.level,
+            "bestScore": game_score.best_score,
+            "completed": game_score.completed
+        } for _, _, game_score in rows if game_score is not None]
         
         response = jsonify({
             "status": 200,
-            "message": "Game score saved successfully",
-            "bestScore": game_score.best_score,
-            "pointsToAdd": points_to_add,
-            "wasNewRecord": points_to_add > 0
+            "authenticated": True,
+            "username": current_user.username,
+            "completion": completion_data,
+            "gameScores": game_scores,
+            "hasFeedback": bool(rows[0][0]),
+            "hasCompletedGame": any(score["completed"] for score in game_scores)
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in save_game_score: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in bootstrap")
         response = jsonify({
             "status": 500,
-            "message": f"Error saving game score: {str(e)}"
+            "message": f"Error loading bootstrap data: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/check-user-feedback", methods=["GET", "OPTIONS"])
+@view.route("/check-user-feedback", methods=["GET"])
 def check_user_feedback():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import Feedback
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required",
             "hasFeedback": False
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -565,43 +583,24 @@ def check_user_feedback():
             "status": 200,
             "hasFeedback": has_feedback
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in check_user_feedback: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in check_user_feedback")
         response = jsonify({
             "status": 500,
             "message": f"Error checking user feedback: {str(e)}",
             "hasFeedback": False
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/check-game-progress", methods=["GET", "OPTIONS"])
+@view.route("/check-game-progress", methods=["GET"])
 def check_game_progress():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from .models import GameScore
-    
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required",
             "hasCompletedGame": False
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -616,20 +615,14 @@ def check_game_progress():
             "status": 200,
             "hasCompletedGame": has_completed_game
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in check_game_progress: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in check_game_progress")
         response = jsonify({
             "status": 500,
             "message": f"Error checking game progress: {str(e)}",
             "hasCompletedGame": False
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
 @view.route('/list-files')
@@ -650,34 +643,16 @@ def backup_db():
         download_name="database-backup.db"
     )
 
-@view.route("/save-feedback", methods=["POST", "OPTIONS"])
+@view.route("/save-feedback", methods=["POST"])
 def save_feedback():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
-    
-    from flask_login import current_user
-    from flask import session
-    from .models import Feedback
-    from . import db
-    
-    if current_user.is_authenticated:
+    if current_user.is_authenticated and not session.permanent:
         session.permanent = True
-        session.modified = True
     
     if not current_user.is_authenticated:
         response = jsonify({
             "status": 401,
             "message": "Authentication required. Please login again."
         })
-        origin = request.headers.get("Origin")
-        if origin:
-            response.headers.add("Access-Control-Allow-Origin", origin)
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 401
     
     try:
@@ -690,8 +665,6 @@ def save_feedback():
                 "status": 406,
                 "message": "Stars rating is required"
             })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 406
         
         try:
@@ -703,8 +676,6 @@ def save_feedback():
                 "status": 406,
                 "message": "Stars must be a number between 1 and 5"
             })
-            response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-            response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 406
         
         new_feedback = Feedback(
@@ -712,9 +683,13 @@ def save_feedback():
             username=current_user.username,
             game_type=None,
             stars=stars,
-            comment=comment
+            comment=comment,
+            # Set from Python so it round-trips through /get-feedbacks cursors
+            created_date=datetime.now(timezone.utc)
         )
         db.session.add(new_feedback)
+        record_feedback(new_feedback.game_type, stars)
+        bump_version(FEEDBACKS)
         db.session.commit()
         
         response = jsonify({
@@ -727,41 +702,107 @@ def save_feedback():
                 "gameType": new_feedback.game_type
             }
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in save_feedback: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_feedback")
         response = jsonify({
             "status": 500,
             "message": f"Error saving feedback: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/get-feedbacks", methods=["GET", "OPTIONS"])
-def get_feedbacks():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
+def _feedback_stats_data(stats):
+    if stats is None:
+        return {"count": 0, "mean": None, "histogram": {str(value): 0 for value in range(1, 6)}}
+    return {
+        "count": stats.count,
+        "mean": round(stats.stars_total / stats.count, 3) if stats.count else None,
+        "histogram": {str(value): getattr(stats, f"stars_{value}") for value in range(1, 6)}
+    }
+
+@view.route("/feedback-stats", methods=["GET"])
+@conditional(FEEDBACKS)
+def get_feedback_stats():
+    try:
+        # One row per game_type ("" is overall feedback), kept current by
+        # save_feedback, so this never scans the feedback table.
+        rows = {stats.game_type: stats for stats in FeedbackStats.query.all()}
+        overall = rows.pop("", None)
+        
+        response = jsonify({
+            "status": 200,
+            "overall": _feedback_stats_data(overall),
+            "byGameType": {
+                game_type: _feedback_stats_data(stats)
+                for game_type, stats in sorted(rows.items())
+            }
+        })
         return response
-    
-    from .models import Feedback
-    from sqlalchemy import desc
+    except Exception as e:
+        logger.exception("Error in get_feedback_stats")
+        response = jsonify({
+            "status": 500,
+            "message": f"Error getting feedback stats: {str(e)}"
+        })
+        return response, 500
+
+FEEDBACK_PAGE_SIZE = 50
+MAX_FEEDBACK_PAGE_SIZE = 100
+
+def _decode_date_cursor(cursor):
+    # Cursors are "<iso datetime>|<id>" for pages ordered by (date DESC, id DESC).
     
     try:
-        limit = request.args.get("limit", type=int, default=50)
-        
-        # Get overall feedbacks only (game_type is null)
-        feedbacks = Feedback.query.filter(
+        date_value, row_id = cursor.rsplit("|", 1)
+        # An unencoded "+00:00" offset arrives as " 00:00" in a query string.
+        return datetime.fromisoformat(date_value.replace(" ", "+")), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+@view.route("/get-feedbacks", methods=["GET"])
+@conditional(FEEDBACKS)
+@cached_response(FEEDBACKS)
+def get_feedbacks():
+    try:
+        limit = request.args.get("limit", type=int, default=FEEDBACK_PAGE_SIZE)
+        limit = max(1, min(limit, MAX_FEEDBACK_PAGE_SIZE))
+        cursor = request.args.get("cursor")
+        
+        # Get overall feedbacks only (game_type is null), walking the
+        # ix_feedback_overall partial index from the cursor position
+        query = db.session.query(
+            Feedback.id,
+            Feedback.username,
+            Feedback.game_type,
+            Feedback.stars,
+            Feedback.comment,
+            Feedback.created_date
+        ).filter(
             Feedback.game_type.is_(None)
-        ).order_by(desc(Feedback.created_date)).limit(limit).all()
+        )
+        if cursor:
+            decoded = _decode_date_cursor(cursor)
+            if decoded is None:
+                response = jsonify({
+                    "status": 406,
+                    "message": "Invalid cursor"
+                })
+                return response, 406
+            after_date, after_id = decoded
+            # A row-value comparison, so both databases can start the index
+            # scan at the cursor instead of filtering down to it.
+            query = query.filter(
+                tuple_(Feedback.created_date, Feedback.id) < tuple_(after_date, after_id)
+            )
+        feedbacks = query.order_by(
+            desc(Feedback.created_date),
+            desc(Feedback.id)
+        ).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(feedbacks) > limit:
+            feedbacks = feedbacks[:limit]
+            next_cursor = f"{feedbacks[-1].created_date.isoformat()}|{feedbacks[-1].id}"
         
         feedbacks_data = [{
             "id": fb.id,
@@ -775,63 +816,90 @@ def get_feedbacks():
         response = jsonify({
             "status": 200,
             "feedbacks": feedbacks_data,
-            "count": len(feedbacks_data)
+            "count": len(feedbacks_data),
+            "nextCursor": next_cursor
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in get_feedbacks: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_feedbacks")
         response = jsonify({
             "status": 500,
             "message": f"Error getting feedbacks: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
 
-@view.route("/get-dedicated-members", methods=["GET", "OPTIONS"])
-def get_dedicated_members():
-    if request.method == "OPTIONS":
-        response = jsonify({})
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
-        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
-        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
-        return response
+DEDICATED_PAGE_SIZE = 100
+
+def _dedicated_members_page(limit, after=None):
+    # One joined query over ix_user_completion_hall, keyset-paginated on
+    # (completed_date DESC, id DESC). Rows without a completion date can't
+    # be placed in that order or encoded in a cursor, so they are left out.
+    
+    query = db.session.query(
+        UserCompletion.id,
+        UserCompletion.completed_date,
+        User.username
+    ).outerjoin(
+        User, User.id == UserCompletion.user_id
+    ).filter(
+        UserCompletion.all_completed == True,
+        UserCompletion.completed_date.isnot(None)
+    )
+    if after is not None:
+        after_date, after_id = after
+        query = query.filter(
+            tuple_(UserCompletion.completed_date, UserCompletion.id) < tuple_(after_date, after_id)
+        )
+    rows = query.order_by(
+        UserCompletion.completed_date.desc(),
+        UserCompletion.id.desc()
+    ).limit(limit + 1).all()
     
-    from .models import UserCompletion, User
-    from sqlalchemy import desc
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, last_date, _ = rows[-1]
+        next_cursor = f"{last_date.isoformat()}|{last_id}"
     
+    members_data = [{
+        "username": username or "Unknown",
+        "completedDate": completed_date.isoformat()
+    } for _, completed_date, username in rows]
+    return members_data, next_cursor
+
+@view.route("/get-dedicated-members", methods=["GET"])
+@conditional(DEDICATED_MEMBERS)
+@cached_response(DEDICATED_MEMBERS)
+def get_dedicated_members():
     try:
-        # Get users who completed all games
-        dedicated_completions = UserCompletion.query.filter(
-            UserCompletion.all_completed == True
-        ).order_by(desc(UserCompletion.completed_date)).limit(100).all()
-        
-        members_data = [{
-            "username": completion.user.username if completion.user else "Unknown",
-            "completedDate": completion.completed_date.isoformat() if completion.completed_date else None
-        } for completion in dedicated_completions]
+        limit = request.args.get("limit", type=int, default=DEDICATED_PAGE_SIZE)
+        limit = max(1, min(limit, DEDICATED_PAGE_SIZE))
+        cursor = request.args.get("cursor")
+        
+        decoded = None
+        if cursor:
+            decoded = _decode_date_cursor(cursor)
+            if decoded is None:
+                response = jsonify({
+                    "status": 406,
+                    "message": "Invalid cursor"
+                })
+                return response, 406
+        # Pages, the first one included, are kept by cached_response until a
+        # completion flips and bumps DEDICATED_MEMBERS.
+        members_data, next_cursor = _dedicated_members_page(limit, decoded)
         
         response = jsonify({
             "status": 200,
             "members": members_data,
-            "count": len(members_data)
+            "count": len(members_data),
+            "nextCursor": next_cursor
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     except Exception as e:
-        print(f"Error in get_dedicated_members: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in get_dedicated_members")
         response = jsonify({
             "status": 500,
             "message": f"Error getting dedicated members: {str(e)}"
         })
-        response.headers.add("Access-Control-Allow-Origin", request.headers.get("Origin", "*"))
-        response.headers.add("Access-Control-Allow-Credentials", "true")
         return response, 500
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""Compare sync gunicorn workers with the async serving mode (asgi.py) at equal memory.
+
+Both modes are started with gunicorn.conf.py and the same number of worker
+processes, so they get the same memory; the total PSS of each server is
+reported to confirm it. Sync workers serve GUNICORN_THREADS requests at a
+time each, async workers run the hot routes on an event loop. A fixed number
+of keep-alive clients then replay the mix of /save-points, /save-game-score,
+/check-session and /leaderboard as logged-in users for --duration seconds.
+The report covers requests per second, p50/p99 latency, non-2xx responses
+and the server's total PSS.
+
+    python benchmarks/async_mode.py --url-db postgresql://... [--db-latency-ms 20]
+        [--workers 2] [--threads 4] [--clients 200] [--duration 20]
+
+--db-latency-ms puts a TCP proxy in front of PostgreSQL that delays traffic
+by that much per round trip, to stand in for a database in another zone; the
+async mode only pays off when requests actually wait on the network. The
+pool settings (DB_POOL_SIZE, DB_MAX_OVERFLOW, ...) are read from the
+environment as usual and apply per worker. Benchmark users are created in
+the target database, so point --url-db at a scratch database. Without
+--url-db a throwaway SQLite file is used. Linux only (reads /proc).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from startup import children, free_port, memory_kb, wait_for_first_request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    "sync": ["gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+    "async": ["gunicorn", "-c", "gunicorn.conf.py", "-k", "uvicorn.workers.UvicornWorker", "asgi:app"]
+}
+
+# (weight, method, path, body)
+MIX = [
+    (4, "POST", "/save-points", lambda: {"points": random.randint(1, 1000)}),
+    (2, "POST", "/save-game-score", lambda: {
+        "gameType": random.choice(["soccer", "rocket", "asteroid"]),
+        "level": random.randint(1, 5),
+        "score": random.randint(1, 100)
+    }),
+    (2, "GET", "/check-session", None),
+    (2, "GET", "/leaderboard", None)
+]
+
+
+def delay_proxy(listen_port, upstream, latency, ready):
+    # Forwards each chunk after latency / 2 in each direction, preserving
+    # order, so a query/response round trip costs about `latency` seconds.
+    async def pipe(reader, writer):
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    writer.close()
+                    return
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                writer.write(data)
+                await writer.drain()
+
+        delivery = asyncio.ensure_future(deliver())
+        try:
+            while True:
+                data = await reader.read(65536)
+                queue.put_nowait((time.monotonic() + latency / 2, data or None))
+                if not data:
+                    break
+            await delivery
+        except ConnectionError:
+            delivery.cancel()
+
+    async def handle(client_reader, client_writer):
+        if upstream[0] == "unix":
+            server_reader, server_writer = await asyncio.open_unix_connection(upstream[1])
+        else:
+            server_reader, server_writer = await asyncio.open_connection(*upstream[1:])
+        await asyncio.gather(
+            pipe(client_reader, server_writer),
+            pipe(server_reader, client_writer),
+            return_exceptions=True
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, "127.0.0.1", listen_port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def start_proxy(url_db, latency):
+    # Returns (process, url) with the URL pointing at the proxy.
+    from sqlalchemy.engine import make_url
+
+    url = make_url(url_db)
+    socket_dir = url.query.get("host")
+    if socket_dir and socket_dir.startswith("/"):
+        upstream = ("unix", os.path.join(socket_dir, f".s.PGSQL.{url.port or 5432}"))
+    else:
+        upstream = ("tcp", url.host or "127.0.0.1", url.port or 5432)
+    port = free_port()
+    ready = multiprocessing.Event()
+    proxy = multiprocessing.Process(target=delay_proxy, args=(port, upstream, latency, ready), daemon=True)
+    proxy.start()
+    ready.wait(10)
+    proxied = url.difference_update_query(["host"]).set(host="127.0.0.1", port=port)
+    return proxy, proxied.render_as_string(hide_password=False)
+
+
+async def send(reader, writer, method, path, headers, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    lines = [f"{method} {path} HTTP/1.1", "Host: bench"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    if body is not None:
+        lines.append("Content-Type: application/json")
+    lines.append(f"Content-Length: {len(payload)}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    cookies = []
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", ""):
+            break
+        name, _, value = line.partition(":")
+        name = name.lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "set-cookie":
+            cookies.append(value.strip().split(";", 1)[0])
+        elif name == "transfer-encoding":
+            raise RuntimeError("chunked responses are not supported")
+    data = await reader.readexactly(length)
+    return status, cookies, data
+
+
+async def sign_up(port, username):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        status, cookies, data = await send(reader, writer, "POST", "/sign-up", {}, {
+            "username": username,
+            "password1": "benchmark",
+            "password2": "benchmark"
+        })
+        if status != 200 or not cookies:
+            raise RuntimeError(f"sign-up failed: {status} {data[:200]!r}")
+        return "; ".join(cookies)
+    finally:
+        writer.close()
+
+
+async def load(port, cookies, clients, duration):
+    weights = [weight for weight, _, _, _ in MIX]
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client(index):
+        nonlocal errors
+        headers = {"Cookie": cookies[index % len(cookies)], "Origin": "http://localhost:5173"}
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while time.monotonic() < deadline:
+                _, method, path, body = random.choices(MIX, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status, _, _ = await send(reader, writer, method, path, headers, body() if body else None)
+                except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+                    errors += 1
+                    writer.close()
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if status >= 300:
+                    errors += 1
+        finally:
+            writer.close()
+
+    started = time.monotonic()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    return latencies, errors, time.monotonic() - started
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run(mode, env, args):
+    port = free_port()
+    env = dict(env, PORT=str(port))
+    server = subprocess.Popen(MODES[mode], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_first_request(port, time.monotonic() + args.timeout):
+            raise RuntimeError(f"{mode} server did not answer within {args.timeout}s")
+
+        async def measure():
+            prefix = f"b{os.getpid()}{mode[0]}{int(time.time()) % 100000}"
+            cookies = [await sign_up(port, f"{prefix}u{index}") for index in range(args.users)]
+            await load(port, cookies, args.clients, min(3.0, args.duration))
+            return await load(port, cookies, args.clients, args.duration)
+
+        latencies, errors, elapsed = asyncio.run(measure())
+        pss = sum(memory_kb(pid)[1] for pid in children(server.pid) + [server.pid])
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "errors": errors,
+            "pss": pss
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url-db", help="DATABASE_URL to serve from (default: a temporary SQLite file)")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0,
+                        help="extra round-trip latency to PostgreSQL (needs --url-db)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="threads per sync worker")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["sync", "async"])
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        LOG_LEVEL="WARNING",
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        # Sign-up hashes every benchmark user's password; keep that cheap.
+        PASSWORD_PBKDF2_ITERATIONS=os.environ.get("PASSWORD_PBKDF2_ITERATIONS", "1000")
+    )
+    proxy = None
+    if args.url_db:
+        env["DATABASE_URL"] = args.url_db
+        if args.db_latency_ms:
+            proxy, env["DATABASE_URL"] = start_proxy(args.url_db, args.db_latency_ms / 1000.0)
+    else:
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "async_mode.db")
+
+    try:
+        print(f"{'mode':>6} {'workers':>7} {'clients':>7} {'req/s':>9} {'p50 (ms)':>9} "
+              f"{'p99 (ms)':>9} {'non-2xx':>8} {'pss (MB)':>9}")
+        for mode in args.modes:
+            result = run(mode, env, args)
+            print(f"{mode:>6} {args.workers:>7} {args.clients:>7} {result['rps']:>9.1f} "
+                  f"{result['p50'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f} "
+                  f"{result['errors']:>8} {result['pss'] / 1024:>9.1f}")
+    finally:
+        if proxy is not None:
+            proxy.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Replay a typical game session the way a browser would, counting CORS preflights.
+
+The script is about twenty minutes of play by one logged-in player: log in,
+load the front page, play four games while saving points every 20 seconds,
+save each level's score and the game's completion, poll /check-session, and
+leave feedback at the end. Time is simulated. Every JSON POST is
+non-simple, so the browser sends a preflight unless it has a cached one for
+that URL. The cache lifetime is the response's Access-Control-Max-Age,
+capped like Chromium (7200 s). If the header is missing, Chromium keeps the
+entry for 5 s.
+
+The replay runs twice against the app in-process. The first run sends no
+Access-Control-Max-Age, as the old per-route OPTIONS handlers did. The
+second uses the configured CORS_MAX_AGE. The report covers HTTP requests,
+preflights, and how many requests opened a Flask session, since preflights
+are answered before that. "failed" counts responses the browser would
+have blocked for missing CORS headers.
+
+    python benchmarks/cors_replay.py [--browser-cap 7200]
+
+Uses a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ORIGIN = "http://localhost:5173"
+DEFAULT_PREFLIGHT_CACHE = 5
+GAMES = ["soccer", "rocket", "asteroid", "quiz"]
+
+
+def game_session():
+    # (seconds since start, method, path, JSON body or None)
+    steps = [
+        (0, "GET", "/check-session", None),
+        (2, "POST", "/login", {"username": "replayer", "password": "replay-pass"}),
+        (3, "GET", "/bootstrap", None),
+        (3, "GET", "/leaderboard", None),
+        (4, "GET", "/get-dedicated-members", None),
+        (4, "GET", "/feedback-stats", None)
+    ]
+    now = 10
+    for game_type in GAMES:
+        started = now
+        for level in range(1, 4):
+            for _ in range(4):
+                now += 20
+                steps.append((now, "POST", "/save-points", {"points": 10 * level}))
+            steps.append((now, "POST", "/save-game-score", {
+                "gameType": game_type,
+                "level": level,
+                "score": 30 * level,
+                "completed": level == 3
+            }))
+            steps.append((now, "GET", f"/get-game-score?gameType={game_type}&level={level}", None))
+        steps.append((now, "POST", "/save-completion", {"gameType": game_type}))
+        steps.append((now + 1, "GET", "/leaderboard", None))
+        steps.append((now + 1, "GET", f"/leaderboard/{game_type}", None))
+        # The page polls its login state once a minute.
+        steps += [(t, "GET", "/check-session", None) for t in range(started + 60, now, 60)]
+        now += 30
+    steps += [
+        (now, "POST", "/save-session", {"gameScores": [], "points": [], "completions": []}),
+        (now + 20, "POST", "/save-feedback", {"stars": 5, "comment": "Fun!"}),
+        (now + 21, "GET", "/check-user-feedback", None)
+    ]
+    return sorted(steps, key=lambda step: step[0])
+
+
+def replay(app, steps, browser_cap):
+    client = app.test_client()
+    preflight_cache = {}
+    counts = {"requests": 0, "preflights": 0, "failed": 0}
+    for at, method, path, body in steps:
+        if body is not None and preflight_cache.get(path, -1) <= at:
+            response = client.options(path, headers={
+                "Origin": ORIGIN,
+                "Access-Control-Request-Method": method,
+                "Access-Control-Request-Headers": "content-type"
+            })
+            counts["requests"] += 1
+            counts["preflights"] += 1
+            if response.headers.get("Access-Control-Allow-Origin") != ORIGIN:
+                counts["failed"] += 1
+                continue
+            max_age = int(response.headers.get("Access-Control-Max-Age", DEFAULT_PREFLIGHT_CACHE))
+            preflight_cache[path] = at + min(max_age, browser_cap)
+
+        response = client.open(path, method=method, json=body, headers={"Origin": ORIGIN})
+        counts["requests"] += 1
+        if response.headers.get("Access-Control-Allow-Origin") != ORIGIN:
+            counts["failed"] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--browser-cap", type=int, default=7200,
+                        help="longest preflight lifetime the browser honours (Chromium: 7200)")
+    args = parser.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "cors_replay.db")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from main import app
+
+    policy = app.extensions["cors"]
+    configured_max_age = policy.max_age
+
+    session_loads = [0]
+    interface = app.session_interface
+    open_session = interface.open_session
+
+    def counting_open_session(flask_app, request):
+        session_loads[0] += 1
+        return open_session(flask_app, request)
+
+    interface.open_session = counting_open_session
+
+    setup = app.test_client()
+    setup.post("/sign-up", json={"username": "replayer", "password1": "replay-pass", "password2": "replay-pass"})
+
+    steps = game_session()
+    print(f"{len(steps)} API calls over {steps[-1][0] // 60} minutes of play")
+    print(f"{'max-age':>12} {'requests':>9} {'preflights':>11} {'session loads':>14} {'failed':>7}")
+    for label, max_age in (("none", 0), (str(configured_max_age), configured_max_age)):
+        policy.max_age = max_age
+        session_loads[0] = 0
+        counts = replay(app, steps, args.browser_cap)
+        print(f"{label:>12} {counts['requests']:>9} {counts['preflights']:>11} "
+              f"{session_loads[0]:>14} {counts['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
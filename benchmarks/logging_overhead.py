@@ -0,0 +1,111 @@
+"""Compare the per-request cost of the logging done by /save-points.
+
+The logging work of one save_points call is timed on its own, inside a
+request context that carries a realistic cookie and Origin header:
+  legacy - the eight print() lines save_points used to emit, cookies included
+  sync   - the structured log_event call, written on the request thread
+  queue  - the same call through the non-blocking queue handler
+  off    - the log_event call with the event's level disabled
+
+Output goes to a line-buffered pipe drained by a reader thread, which is
+how stdout behaves under a process manager with PYTHONUNBUFFERED set.
+
+    python benchmarks/logging_overhead.py [--iterations 20000]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COOKIE = "session=" + "x" * 180 + "; remember_token=1|" + "y" * 128
+
+
+def pipe_stdout():
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, "rb") as reader:
+            while reader.read(65536):
+                pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return io.TextIOWrapper(os.fdopen(write_fd, "wb"), line_buffering=True)
+
+
+def legacy(logger, log_event):
+    from flask import request, session
+
+    print(f"save-points endpoint called")
+    print(f"Request cookies: {dict(request.cookies)}")
+    print(f"Session keys: {list(session.keys())}")
+    print(f"Session ID: {session.get('_id', 'N/A')}")
+    print(f"Current user authenticated: True")
+    print(f"Current user: alice")
+    print(f"Request headers Origin: {request.headers.get('Origin', 'N/A')}")
+    print(f"Points saved successfully: 42 for user alice")
+
+
+def structured(logger, log_event):
+    log_event(logger, "points.saved", user_id=1, points=42)
+
+
+def measure(app, fn, iterations):
+    import logging
+    from flask import request
+    from back_end.logs import log_event
+
+    logger = logging.getLogger("back_end.view")
+    timings = []
+    with app.test_request_context("/save-points", method="POST", headers={
+        "Cookie": COOKIE, "Origin": "http://localhost:5173"
+    }):
+        app.session_interface.open_session(app, request)
+        for _ in range(iterations):
+            started = time.perf_counter()
+            fn(logger, log_event)
+            timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.mean(timings), sorted(timings)[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    report = sys.stdout
+    results = {}
+    for mode, level, handler, fn in [
+        ("legacy", "CRITICAL", "sync", legacy),
+        ("sync", "INFO", "sync", structured),
+        ("queue", "INFO", "queue", structured),
+        ("off", "WARNING", "queue", structured),
+    ]:
+        os.environ.update(LOG_LEVEL=level, LOG_HANDLER=handler)
+        sys.stdout = pipe_stdout()
+        try:
+            from back_end import create_app
+            app = create_app()
+            results[mode] = measure(app, fn, args.iterations)
+            log_handler = app.extensions["log_handler"]
+            if hasattr(log_handler, "stop"):
+                log_handler.stop()
+        finally:
+            sys.stdout.flush()
+            sys.stdout = report
+
+    print(f"{'mode':<8} {'mean us':>9} {'p99 us':>9}")
+    for mode, (mean, p99) in results.items():
+        print(f"{mode:<8} {mean:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
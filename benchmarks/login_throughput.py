@@ -0,0 +1,117 @@
+"""Measure login throughput and the latency of a cheap endpoint under a login burst.
+
+Login threads hammer POST /login while a probe thread times GET /leaderboard.
+The report covers logins per second, how many logins got a 503 from the
+saturated hashing pool, and the probe's p50/p99 latency.
+
+    python benchmarks/login_throughput.py [--login-threads 16] [--duration 10]
+    python benchmarks/login_throughput.py --url http://127.0.0.1:8000
+
+Without --url the app is served in-process by a threaded Werkzeug server on
+a throwaway SQLite file. That server starts a thread per request, so the
+shipped behaviour is better measured against gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py main:app &
+    python benchmarks/login_throughput.py --url http://127.0.0.1:5000
+
+PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING and GUNICORN_THREADS are
+read from the environment as usual, so their effect can be compared.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def request(base, method, path, body=None):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def serve_in_process():
+    if not os.environ.get("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    from werkzeug.serving import make_server
+    from back_end import create_app
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--login-threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--probe-path", default="/leaderboard")
+    args = parser.parse_args()
+
+    base = args.url or serve_in_process()
+    password = "benchpass1"
+    usernames = [f"bench{os.getpid()}_{i}" for i in range(args.users)]
+    for username in usernames:
+        request(base, "POST", "/sign-up", {"username": username, "password1": password, "password2": password})
+
+    stop = threading.Event()
+    counts = {"ok": 0, "busy": 0, "other": 0}
+    counts_lock = threading.Lock()
+    probe_latencies = []
+
+    def login_worker(index):
+        username = usernames[index % len(usernames)]
+        while not stop.is_set():
+            status = request(base, "POST", "/login", {"username": username, "password": password})
+            key = "ok" if status == 200 else "busy" if status == 503 else "other"
+            with counts_lock:
+                counts[key] += 1
+
+    def probe_worker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            request(base, "GET", args.probe_path)
+            probe_latencies.append((time.perf_counter() - started) * 1000.0)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(args.login_threads)]
+    threads.append(threading.Thread(target=probe_worker))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"logins: {counts['ok']} ok, {counts['busy']} rejected (503), {counts['other']} other in {elapsed:.1f}s")
+    print(f"login throughput: {counts['ok'] / elapsed:.1f}/s")
+    print(f"{args.probe_path}: {len(probe_latencies)} requests, "
+          f"p50 {percentile(probe_latencies, 0.50):.1f} ms, p99 {percentile(probe_latencies, 0.99):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Measure gunicorn startup time and per-worker memory, with and without --preload.
+
+For each worker count the server is started with gunicorn.conf.py, once with
+GUNICORN_PRELOAD=true and once with false. The report covers:
+  first   - seconds from spawning gunicorn to the first 200 from /leaderboard
+  rss     - mean resident set size per worker
+  pss     - mean proportional set size per worker; pages shared copy-on-write
+            with the master are split between the processes sharing them, so
+            this is what preloading actually saves
+
+    python benchmarks/startup.py [--workers 1 4 8] [--url-db postgresql://...]
+
+Without --url-db every run uses the same throwaway SQLite file, created by a
+first boot so that the timed runs see an up-to-date schema. Linux only (reads
+/proc).
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_first_request(port, deadline):
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/leaderboard")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            found.append(int(entry))
+    return found
+
+
+def memory_kb(pid):
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def run(workers, preload, env, timeout):
+    port = free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.monotonic()
+    server = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_for_first_request(port, started + timeout):
+            raise RuntimeError(f"server with {workers} workers did not answer within {timeout}s")
+        first = time.monotonic() - started
+
+        # Every worker has to be up (and have handled a request) before its
+        # memory is representative.
+        deadline = time.monotonic() + timeout
+        while len(children(server.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for _ in range(workers * 20):
+            wait_for_first_request(port, time.monotonic() + 5)
+
+        usage = [memory_kb(pid) for pid in children(server.pid)]
+        return {
+            "first": first,
+            "rss": sum(rss for rss, _ in usage) / len(usage),
+            "pss": sum(pss for _, pss in usage) / len(usage)
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--url-db", help="DATABASE_URL to boot against (default: a temporary SQLite file)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    if args.url_db:
+        env["DATABASE_URL"] = args.url_db
+    else:
+        env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db")
+        run(1, True, env, args.timeout)
+
+    print(f"{'workers':>7} {'preload':>7} {'first (s)':>10} {'rss/worker (MB)':>16} {'pss/worker (MB)':>16}")
+    for workers in args.workers:
+        for preload in (False, True):
+            result = run(workers, preload, env, args.timeout)
+            print(f"{workers:>7} {str(preload).lower():>7} {result['first']:>10.2f} "
+                  f"{result['rss'] / 1024:>16.1f} {result['pss'] / 1024:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
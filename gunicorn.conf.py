@@ -0,0 +1,51 @@
+# gunicorn -c gunicorn.conf.py main:app
+# gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+import os
+import tempfile
+
+port = os.environ.get('PORT', '5000')
+bind = f"0.0.0.0:{port}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Build the app once in the master: imports, engine setup and the schema
+# check happen a single time and workers share that memory copy-on-write.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true") == "true"
+
+# Workers snapshot their metrics here so /metrics reports the whole server.
+# One directory per port, since it is cleared when the master starts.
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"newton-game-metrics-{port}"))
+
+
+def _flask_app(server):
+    app = server.app.wsgi()
+    # asgi:app keeps the Flask app it wraps on its state.
+    return getattr(getattr(app, "state", None), "flask_app", app)
+
+
+def on_starting(server):
+    if os.environ["METRICS_DIR"]:
+        from back_end.metrics import clear_metrics_dir
+        clear_metrics_dir(os.environ["METRICS_DIR"])
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from back_end.pool import dispose_engine_after_fork
+        dispose_engine_after_fork(_flask_app(server))
+
+
+def worker_exit(server, worker):
+    # Write the final snapshot, so nothing since the last periodic flush is
+    # lost. Skipped if the app never loaded in this worker.
+    if server.app.callable is None:
+        return
+    registry = _flask_app(server).extensions.get("metrics")
+    if registry is not None and registry.directory:
+        registry.flush()
+
+
+def child_exit(server, worker):
+    if os.environ["METRICS_DIR"]:
+        from back_end.metrics import mark_process_dead
+        mark_process_dead(os.environ["METRICS_DIR"], worker.pid)
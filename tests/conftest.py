@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    # create_app() reads its settings from the environment; each test gets
+    # its own SQLite file and whatever overrides it passes.
+    def make(**env):
+        settings = {
+            "DATABASE_URL": "sqlite:///" + str(tmp_path / "test.db"),
+            "LOG_LEVEL": "WARNING",
+            "LOG_HANDLER": "sync",
+            "METRICS_DIR": str(tmp_path / "metrics"),
+            "PASSWORD_PBKDF2_ITERATIONS": "1000",
+            # Strict N+1 detection: any request that runs one statement more
+            # than this fails with a 500. A session can bump the leaderboard
+            # and dedicated members versions with the same statement.
+            "SQL_STRICT_REPEAT_LIMIT": "2"
+        }
+        settings.update(env)
+        for name, value in settings.items():
+            monkeypatch.setenv(name, value)
+
+        from back_end import create_app
+        return create_app()
+
+    return make
+
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+from back_end import db
+from back_end.models import User, UserCompletion
+
+
+def test_members_without_a_completion_date_do_not_break_paging(make_app):
+    app = make_app()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with app.app_context():
+        for index, name in enumerate(["ada", "bea", "cyd", "dee"]):
+            user = User(username=name, password="unused")
+            db.session.add(user)
+            db.session.flush()
+            # dee finished before completion dates were recorded.
+            completed_date = None if name == "dee" else start + timedelta(days=index)
+            db.session.add(UserCompletion(user_id=user.id, all_completed=True, completed_date=completed_date))
+        db.session.commit()
+
+    client = app.test_client()
+    members = client.get("/get-dedicated-members").get_json()["members"]
+    assert [member["username"] for member in members] == ["cyd", "bea", "ada"]
+
+    names, cursor = [], None
+    while True:
+        query = "?limit=1" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get("/get-dedicated-members" + query).get_json()
+        assert page["status"] == 200
+        names += [member["username"] for member in page["members"]]
+        cursor = page["nextCursor"]
+        if not cursor:
+            break
+    assert names == ["cyd", "bea", "ada"]
@@ -0,0 +1,55 @@
+import random
+import threading
+
+THREADS = 8
+SUBMISSIONS = 20
+
+
+def test_racing_submissions_account_for_every_gain(make_app):
+    # Many concurrent /save-game-score calls on one (user, game, level) key.
+    # A lost update or a double-counted gain shows up as pointsToAdd not
+    # summing to the final best, or a bestScore below a submitted score.
+    app = make_app()
+    signup = app.test_client().post("/sign-up", json={
+        "username": "racer", "password1": "racepass1", "password2": "racepass1"
+    })
+    cookies = [header.split(";", 1)[0].split("=", 1) for header in signup.headers.getlist("Set-Cookie")]
+
+    results = []
+    results_lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker(seed):
+        scores = random.Random(seed)
+        client = app.test_client()
+        for name, value in cookies:
+            client.set_cookie(name, value)
+        local = []
+        barrier.wait()
+        for _ in range(SUBMISSIONS):
+            score = scores.randrange(10000)
+            response = client.post("/save-game-score", json={
+                "gameType": "race", "level": 1, "score": score, "completed": True
+            })
+            local.append((score, response.status_code, response.get_json()))
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == THREADS * SUBMISSIONS
+    assert all(status == 200 for _, status, _ in results)
+    assert sum(body["pointsToAdd"] for _, _, body in results) == max(score for score, _, _ in results)
+    for score, _, body in results:
+        assert body["bestScore"] >= score
+        assert body["wasNewRecord"] == (body["pointsToAdd"] > 0)
+
+    stored = app.test_client()
+    for name, value in cookies:
+        stored.set_cookie(name, value)
+    best = stored.get("/get-game-score?gameType=race&level=1").get_json()["score"]["bestScore"]
+    assert best == max(score for score, _, _ in results)
@@ -0,0 +1,49 @@
+from back_end import versions
+
+
+def sign_up(client, username):
+    return client.post("/sign-up", json={
+        "username": username,
+        "password1": "password1",
+        "password2": "password1"
+    })
+
+
+def save_score(client, game_type, level, score):
+    return client.post("/save-game-score", json={"gameType": game_type, "level": level, "score": score})
+
+
+def board(client, path):
+    return [(row["username"], row["score"]) for row in client.get(path).get_json()["leaderboard"]]
+
+
+def test_new_best_score_reaches_cached_game_boards(make_app):
+    app = make_app()
+    alice, bob = app.test_client(), app.test_client()
+    sign_up(alice, "alice")
+    sign_up(bob, "bobby")
+    save_score(alice, "soccer", 1, 50)
+    save_score(bob, "soccer", 1, 40)
+    save_score(bob, "soccer", 2, 30)
+
+    assert board(alice, "/leaderboard/soccer/1") == [("alice", 50), ("bobby", 40)]
+    assert board(alice, "/leaderboard/soccer") == [("bobby", 70), ("alice", 50)]
+
+    save_score(bob, "soccer", 1, 90)
+    assert board(alice, "/leaderboard/soccer/1") == [("bobby", 90), ("alice", 50)]
+    assert board(alice, "/leaderboard/soccer") == [("bobby", 120), ("alice", 50)]
+    # Not a new best: the boards keep their versions.
+    before = versions.cached_version(versions.game_board("soccer", 1), 60)
+    assert before is not None
+    save_score(bob, "soccer", 1, 10)
+    assert versions.cached_version(versions.game_board("soccer", 1), 60) == before
+
+
+def test_arbitrary_game_board_urls_stay_bounded(make_app):
+    app = make_app(RESPONSE_CACHE_SIZE="64")
+    client = app.test_client()
+    for index in range(versions.VERSION_CACHE_SIZE + 200):
+        assert client.get(f"/leaderboard/g{index}/{index}").status_code == 200
+
+    assert len(app.extensions["response_cache"].backend._entries) <= 64
+    assert len(versions._cache) <= versions.VERSION_CACHE_SIZE
@@ -0,0 +1,60 @@
+import os
+import threading
+
+from back_end.metrics import MetricsRegistry, clear_metrics_dir, mark_process_dead
+
+
+def worker_registry(directory, pid, hits, depth):
+    registry = MetricsRegistry(directory=str(directory))
+    registry.register_collector(lambda: {"cache_hits": hits}, kind="counter")
+    registry.register_collector(lambda: {"queue_depth": depth})
+    registry.observe("/leaderboard", "GET", 200, 0.01, 10)
+    registry.flush()
+    os.replace(directory / f"metrics-{os.getpid()}.json", directory / f"metrics-{pid}.json")
+
+
+def test_exited_workers_keep_their_counters(tmp_path):
+    clear_metrics_dir(str(tmp_path))
+    # Pids far above pid_max, so they can't belong to a live process.
+    worker_registry(tmp_path, 99999991, hits=5, depth=3)
+    worker_registry(tmp_path, 99999992, hits=7, depth=4)
+    mark_process_dead(str(tmp_path), 99999991)
+    # A later worker reusing the pid doesn't overwrite what was folded in.
+    worker_registry(tmp_path, 99999991, hits=1, depth=2)
+
+    scraper = MetricsRegistry(directory=str(tmp_path))
+    scraper.register_collector(lambda: {"cache_hits": 0}, kind="counter")
+    scraper.register_collector(lambda: {"queue_depth": 1})
+    text = scraper.render()
+
+    assert "# TYPE cache_hits counter\ncache_hits 13\n" in text
+    assert 'http_requests_total{route="/leaderboard",method="GET",status="200"} 3' in text
+    # Gauges only come from live processes: the scraping one here.
+    assert "# TYPE queue_depth gauge\nqueue_depth 1\n" in text
+
+
+def test_concurrent_flushes_and_renders_never_raise(tmp_path):
+    registry = MetricsRegistry(directory=str(tmp_path), flush_interval=0)
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def hammer(index):
+        barrier.wait()
+        try:
+            for _ in range(200):
+                if index % 2:
+                    registry.observe("/leaderboard", "GET", 200, 0.01, 10)
+                else:
+                    registry.render()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=hammer, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(os.listdir(tmp_path)) == [f"metrics-{os.getpid()}.json"]
+    assert 'status="200"} 800' in registry.render()
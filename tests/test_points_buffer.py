@@ -0,0 +1,57 @@
+import threading
+
+from back_end import db, ingest
+from back_end.models import Point
+
+
+def test_flush_timeout_answers_pending_without_losing_the_points(make_app, monkeypatch):
+    app = make_app(POINTS_WRITE_BEHIND="true", POINTS_DURABILITY="flushed")
+    client = app.test_client()
+    client.post("/sign-up", json={"username": "player", "password1": "password1", "password2": "password1"})
+
+    release = threading.Event()
+    flush = ingest.PointWriteBuffer._flush
+
+    def slow_flush(self, batch):
+        release.wait(10)
+        flush(self, batch)
+
+    wait = ingest._Ticket.wait
+    monkeypatch.setattr(ingest.PointWriteBuffer, "_flush", slow_flush)
+    monkeypatch.setattr(ingest._Ticket, "wait", lambda self, timeout=None: wait(self, 0.1))
+
+    response = client.post("/save-points", json={"points": 42})
+    assert response.status_code == 202
+    assert response.get_json()["pending"] is True
+
+    release.set()
+    app.extensions["points_buffer"].stop()
+    with app.app_context():
+        assert [row.points for row in db.session.query(Point)] == [42]
+
+
+def test_buffered_batch_is_retried_after_a_failed_flush(make_app, monkeypatch):
+    app = make_app(POINTS_WRITE_BEHIND="true", POINTS_DURABILITY="buffered")
+    client = app.test_client()
+    client.post("/sign-up", json={"username": "player", "password1": "password1", "password2": "password1"})
+
+    write = ingest.PointWriteBuffer._write
+    failures = []
+
+    def flaky_write(self, batch):
+        if not failures:
+            failures.append(batch)
+            return RuntimeError("deadlock detected")
+        return write(self, batch)
+
+    monkeypatch.setattr(ingest.PointWriteBuffer, "_write", flaky_write)
+    monkeypatch.setattr(ingest, "FLUSH_RETRY_DELAY", 0)
+
+    assert client.post("/save-points", json={"points": 7}).status_code == 200
+    points_buffer = app.extensions["points_buffer"]
+    points_buffer.stop()
+
+    assert failures
+    assert points_buffer.flush_errors == 1
+    with app.app_context():
+        assert [row.points for row in db.session.query(Point)] == [7]
@@ -0,0 +1,47 @@
+from back_end.models import GameScore
+
+
+def sign_up(client, username):
+    return client.post("/sign-up", json={
+        "username": username,
+        "password1": "password1",
+        "password2": "password1"
+    })
+
+
+def test_session_scores_are_saved_in_one_statement_with_per_item_results(make_app):
+    # The test app runs with strict N+1 detection, so a session that saved
+    # its scores one statement at a time would fail with a 500.
+    app = make_app()
+    client = app.test_client()
+    sign_up(client, "alice")
+    client.post("/save-game-score", json={"gameType": "soccer", "level": 1, "score": 50})
+
+    response = client.post("/save-session", json={
+        "gameScores": [
+            {"gameType": "soccer", "level": 1, "score": 40},
+            {"gameType": "soccer", "level": 1, "score": 70},
+            "not a score",
+            {"gameType": "soccer", "level": 2, "score": 30, "completed": True},
+            {"gameType": "soccer", "level": 1, "score": 60},
+            {"gameType": "soccer", "level": 1, "score": 90},
+            {"gameType": "chess", "level": 1, "score": 20}
+        ] + [{"gameType": "puzzle", "level": level, "score": level} for level in range(1, 11)],
+        "points": [5, 7]
+    })
+    assert response.status_code == 200
+    results = response.get_json()["gameScores"]
+    assert [(r.get("bestScore"), r.get("pointsToAdd")) for r in results[:7]] == [
+        (50, 0), (70, 20), (None, None), (30, 30), (70, 0), (90, 20), (20, 20)
+    ]
+    assert results[2]["status"] == 406
+    assert [r["pointsToAdd"] for r in results[7:]] == list(range(1, 11))
+
+    with app.app_context():
+        rows = {(s.game_type, s.level): (s.best_score, s.completed) for s in GameScore.query.all()}
+    assert rows[("soccer", 1)] == (90, False)
+    assert rows[("soccer", 2)] == (30, True)
+    assert len(rows) == 13
+
+    board = client.get("/leaderboard/soccer").get_json()["leaderboard"]
+    assert [(row["username"], row["score"]) for row in board] == [("alice", 120)]
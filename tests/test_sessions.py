@@ -0,0 +1,51 @@
+def sign_up(client, username):
+    return client.post("/sign-up", json={
+        "username": username,
+        "password1": "password1",
+        "password2": "password1"
+    })
+
+
+def login(client, username):
+    return client.post("/login", json={"username": username, "password": "password1"})
+
+
+def session_cookie(client, app):
+    cookie = client.get_cookie(app.config["SESSION_COOKIE_NAME"])
+    return cookie.value if cookie else None
+
+
+def test_login_does_not_keep_a_fixed_session_id(make_app):
+    app = make_app(SESSION_BACKEND="memory")
+    sign_up(app.test_client(), "victim")
+
+    # The attacker gets a valid, anonymous stored session and plants its
+    # cookie in the victim's browser.
+    attacker = app.test_client()
+    with attacker.session_transaction() as session:
+        session["visited"] = True
+    fixed = session_cookie(attacker, app)
+    assert fixed
+
+    victim = app.test_client()
+    victim.set_cookie(app.config["SESSION_COOKIE_NAME"], fixed)
+    assert login(victim, "victim").get_json()["status"] == 200
+    assert session_cookie(victim, app) != fixed
+
+    response = attacker.get("/check-session")
+    assert response.status_code == 401
+    assert response.get_json()["authenticated"] is False
+
+
+def test_logout_retires_the_session_id(make_app):
+    app = make_app(SESSION_BACKEND="memory")
+    client = app.test_client()
+    sign_up(client, "player")
+    logged_in = session_cookie(client, app)
+
+    client.get("/logout")
+    assert session_cookie(client, app) != logged_in
+
+    stale = app.test_client()
+    stale.set_cookie(app.config["SESSION_COOKIE_NAME"], logged_in)
+    assert stale.get("/check-session").status_code == 401
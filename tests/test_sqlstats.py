@@ -0,0 +1,35 @@
+from sqlalchemy import select
+
+from back_end import db
+from back_end.models import User
+from back_end.sqlstats import allows_repeated_queries
+
+
+def add_repeating_view(app, path, times, view_decorator=None):
+    def view():
+        for user_id in range(times):
+            db.session.execute(select(User.id).where(User.id == user_id)).first()
+        return {"status": 200}
+
+    if view_decorator is not None:
+        view = view_decorator(view)
+    app.add_url_rule(path, path.strip("/"), view)
+
+
+def test_strict_mode_fails_a_request_that_repeats_a_statement(make_app):
+    app = make_app()
+    limit = app.config["SQL_STRICT_REPEAT_LIMIT"]
+    add_repeating_view(app, "/within-limit", limit)
+    add_repeating_view(app, "/n-plus-one", limit + 1)
+    client = app.test_client()
+
+    assert client.get("/within-limit").status_code == 200
+    response = client.get("/n-plus-one")
+    assert response.status_code == 500
+    assert "likely an N+1 query" in response.get_json()["message"]
+
+
+def test_allows_repeated_queries_exempts_a_view(make_app):
+    app = make_app()
+    add_repeating_view(app, "/batch", app.config["SQL_STRICT_REPEAT_LIMIT"] + 5, allows_repeated_queries)
+    assert app.test_client().get("/batch").status_code == 200